@@ -0,0 +1,178 @@
+import time
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.cluster import KMeans
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize
+from sklearn.utils.extmath import safe_sparse_dot
+from neighbours import select_top_k
+
+def _scores_against(vectors, rows, position):
+    # Dot products of the given rows with one row. The query row is densified first: a sparse
+    # matrix times a dense vector is several times faster than sparse times sparse here.
+    query = vectors[position].toarray().ravel() if sp.issparse(vectors) else vectors[position]
+    return np.asarray(vectors[rows] @ query, dtype=np.float64).ravel()
+
+class _CandidateIndex:
+    # Subclasses fit self.vectors (row-normalized), self.labels and self._positions and return the
+    # candidate item positions for a query; the candidates are rescored with exact cosine
+    def query(self, position, k=5):
+        candidates = self.candidates(position)
+        candidates = candidates[candidates != position]
+        if len(candidates) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        # Exact cosine rescoring of the candidates only
+        scores = _scores_against(self.vectors, candidates, position)
+        best = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return candidates[best], scores[best]
+
+    def similar_items(self, item_name, top_n=5):
+        if item_name not in self._positions.index:
+            return None
+        neighbours, scores = self.query(self._positions[item_name], k=top_n)
+        return pd.Series(scores, index=self.labels[neighbours])
+
+class LSHIndex(_CandidateIndex):
+    # Random-projection LSH over item vectors. More tables or probes raise recall,
+    # more bits per table make buckets smaller and queries faster. On sparse purchase vectors
+    # the buckets are poor: 32/8/2 reaches recall@10 0.81 only by rescoring about half the
+    # catalog (1.8 ms per query on 4k items, no faster than exact), and the settings that come
+    # near a millisecond recall 0.30 or less. IVFIndex is the sub-millisecond option.
+    def __init__(self, n_tables=32, n_bits=8, n_probes=2, random_state=0):
+        if n_bits < 1 or n_bits + int(np.ceil(np.log2(max(n_tables, 2)))) > 62:
+            raise ValueError("n_bits must be at least 1 and leave room for the table number in 62 bits")
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.n_probes = n_probes
+        self.random_state = random_state
+
+    @property
+    def settings(self):
+        return {"n_tables": self.n_tables, "n_bits": self.n_bits, "n_probes": self.n_probes}
+
+    def fit(self, item_vectors, labels=None):
+        self.vectors = normalize(item_vectors).astype(np.float32)
+        n_items = self.vectors.shape[0]
+        self.labels = pd.Index(labels if labels is not None else range(n_items))
+        self._positions = pd.Series(np.arange(n_items), index=self.labels)
+
+        rng = np.random.default_rng(self.random_state)
+        planes = rng.standard_normal((self.vectors.shape[1], self.n_tables * self.n_bits)).astype(np.float32)
+        projections = safe_sparse_dot(self.vectors, planes, dense_output=True)
+        bits = np.asarray(projections > 0).reshape(n_items, self.n_tables, self.n_bits)
+        self._powers = np.left_shift(np.int64(1), np.arange(self.n_bits, dtype=np.int64))
+        self.codes = bits.astype(np.int64) @ self._powers
+
+        # All tables share one sorted code array (codes tagged with their table), so a bucket is a slice
+        tagged = self.codes + (np.arange(self.n_tables, dtype=np.int64) << self.n_bits)
+        self._order = np.argsort(tagged, axis=None, kind="stable")
+        self._sorted_codes = tagged.ravel()[self._order]
+        self._order //= self.n_tables
+        return self
+
+    def candidates(self, position):
+        # Each table's bucket plus its n_probes nearest buckets (single bit flips)
+        codes = self.codes[position][:, np.newaxis]
+        probes = np.hstack([codes, np.bitwise_xor(codes, self._powers[:self.n_probes])])
+        probes += np.arange(self.n_tables, dtype=np.int64)[:, np.newaxis] << self.n_bits
+        lo = np.searchsorted(self._sorted_codes, probes.ravel(), side="left")
+        hi = np.searchsorted(self._sorted_codes, probes.ravel(), side="right")
+        return np.unique(np.concatenate([self._order[a:b] for a, b in zip(lo, hi)]))
+
+class IVFIndex(_CandidateIndex):
+    # Inverted-file index: items are grouped into n_lists k-means cells of a low-rank (truncated SVD)
+    # embedding of their vectors. A query visits its n_probes nearest cells, ranks their members in
+    # the embedding and rescores only the best max_candidates exactly, so the exact work per query
+    # is bounded. n_probes and max_candidates are the recall/speed knobs, and n_lists should
+    # grow with the catalog (roughly its square root). On 4k items the defaults reach recall@10
+    # 0.90 at 0.7-0.8 ms per query (exact: 1.6 ms). On a 40k-item synthetic catalog the target is
+    # not met: 128 lists / 16 probes give recall 0.45 at 1.8 ms (exact: 6.4 ms).
+    def __init__(self, n_lists=32, n_probes=8, max_candidates=200, n_factors=64, random_state=0):
+        if n_lists < 1 or n_probes < 1 or max_candidates < 1:
+            raise ValueError("n_lists, n_probes and max_candidates must be at least 1")
+        self.n_lists = n_lists
+        self.n_probes = n_probes
+        self.max_candidates = max_candidates
+        self.n_factors = n_factors
+        self.random_state = random_state
+
+    @property
+    def settings(self):
+        return {"n_lists": self.n_lists, "n_probes": self.n_probes, "max_candidates": self.max_candidates,
+                "n_factors": self.n_factors}
+
+    def fit(self, item_vectors, labels=None):
+        self.vectors = normalize(item_vectors).astype(np.float32)
+        n_items = self.vectors.shape[0]
+        self.labels = pd.Index(labels if labels is not None else range(n_items))
+        self._positions = pd.Series(np.arange(n_items), index=self.labels)
+
+        n_factors = max(1, min(self.n_factors, min(self.vectors.shape) - 1))
+        svd = TruncatedSVD(n_components=n_factors, random_state=self.random_state)
+        self.embedding = normalize(svd.fit_transform(self.vectors)).astype(np.float32)
+        kmeans = KMeans(n_clusters=min(self.n_lists, n_items), n_init=1, random_state=self.random_state).fit(self.embedding)
+        self.centroids = kmeans.cluster_centers_.astype(np.float32)
+
+        # Items sorted by cell, so a cell's members are one slice
+        cells = kmeans.labels_
+        self._order = np.argsort(cells, kind="stable")
+        self._cell_ptr = np.searchsorted(cells[self._order], np.arange(len(self.centroids) + 1))
+        return self
+
+    def candidates(self, position):
+        embedded = self.embedding[position]
+        n_probes = min(self.n_probes, len(self.centroids))
+        cells = np.argpartition(-(self.centroids @ embedded), n_probes - 1)[:n_probes]
+        members = np.concatenate([self._order[self._cell_ptr[c]:self._cell_ptr[c + 1]] for c in cells])
+        if len(members) > self.max_candidates:
+            closest = np.argpartition(-(self.embedding[members] @ embedded), self.max_candidates - 1)
+            members = members[closest[:self.max_candidates]]
+        return members
+
+def exact_neighbours(item_vectors, positions, k=5):
+    vectors = normalize(item_vectors)
+    block = safe_sparse_dot(vectors[positions], vectors.T, dense_output=True)
+    _, neighbours, _ = select_top_k(np.asarray(block, dtype=np.float64), k, offset=positions)
+    return neighbours.reshape(len(positions), -1)
+
+def recall_at_k(index, item_vectors, k=10, sample_size=200, random_state=0):
+    # Share of the exact top-k neighbours that the index returns, over a sample of query items
+    n_items = item_vectors.shape[0]
+    rng = np.random.default_rng(random_state)
+    positions = rng.choice(n_items, size=min(sample_size, n_items), replace=False)
+    exact = exact_neighbours(item_vectors, positions, k=k)
+
+    # The exact path for one query: cosine against every item, then a top-k selection
+    vectors = normalize(item_vectors)
+    hits, latencies, exact_latencies = 0, [], []
+    for position, truth in zip(positions, exact):
+        start = time.perf_counter()
+        found, _ = index.query(position, k=k)
+        latencies.append(time.perf_counter() - start)
+        hits += len(np.intersect1d(found, truth))
+
+        start = time.perf_counter()
+        row = np.asarray(safe_sparse_dot(vectors, vectors[position].T, dense_output=True), dtype=np.float64)
+        select_top_k(row.reshape(1, -1), k, offset=[position])
+        exact_latencies.append(time.perf_counter() - start)
+    mean_query_ms = 1000 * float(np.mean(latencies))
+    exact_query_ms = 1000 * float(np.mean(exact_latencies))
+    return {
+        "recall": hits / max(exact.size, 1),
+        "mean_query_ms": mean_query_ms,
+        "p99_query_ms": 1000 * float(np.percentile(latencies, 99)),
+        "exact_query_ms": exact_query_ms,
+        "speedup": exact_query_ms / mean_query_ms
+    }
+
+def evaluate_lsh_settings(item_vectors, settings, k=10, sample_size=200, index_class=LSHIndex):
+    # settings: iterable of constructor keyword dicts, e.g. a small grid of n_tables / n_bits /
+    # n_probes, or of n_lists / n_probes / max_candidates with index_class=IVFIndex
+    results = []
+    for params in settings:
+        index = index_class(**params).fit(item_vectors)
+        results.append({**index.settings, **recall_at_k(index, item_vectors, k=k, sample_size=sample_size)})
+    return pd.DataFrame(results)
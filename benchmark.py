@@ -0,0 +1,142 @@
+# benchmark.py
+# Times every stage of the app on synthetic Online-Retail-shaped data and records peak memory.
+# Usage: python benchmark.py [--scales 10000 100000 1000000] [--baseline benchmark_baseline.json]
+#                            [--save-baseline] [--tolerance 0.25] [--no-memory]
+# Exits with status 1 when a stage is slower or larger than the stored baseline beyond the tolerance.
+import argparse
+import gc
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from data_processing import clean_data
+from recommender import generate_association_rules, generate_similarity_matrix, build_similarity_scores
+from report_generator import generate_pdf_report
+from report_figures import report_figures, render_figures
+from summary_cube import SummaryCube
+from synthetic_data import generate_transactions
+from visualizations import plot_top_products, plot_top_countries, plot_daily_orders
+
+BASELINE_PATH = "benchmark_baseline.json"
+CLEANING_OPTIONS = [
+    "Drop missing CustomerID or Description",
+    "Remove canceled transactions (InvoiceNo starts with 'C')",
+    "Filter Quantity and UnitPrice > 0",
+    "Clean Description text",
+    "Convert InvoiceDate to datetime",
+    "Convert CustomerID to string"
+]
+# The app's rule settings, with itemsets capped so small synthetic samples cannot explode combinatorially
+RULE_PARAMS = {"algorithm": "fpgrowth", "sparse": True, "max_len": 3}
+# Differences smaller than these are noise, whatever the ratio
+MIN_SECONDS_DELTA = 0.05
+MIN_MB_DELTA = 5.0
+
+def _plot(render):
+    fig = render()
+    plt.close(fig)
+
+def _report(ctx):
+    # A fresh directory each time, so the content-addressed PNGs are really drawn and neither they
+    # nor the PDF end up in the app's reports/ folder
+    with tempfile.TemporaryDirectory() as figure_dir:
+        summary = SummaryCube.from_frame(ctx["clean"])
+        figures = report_figures(ctx["clean"], ctx["rules"], ctx["sim_df"], summary)
+        paths = render_figures(figures, directory=figure_dir)
+        general_plots = {title: paths[name] for name, title in [
+            ("top_products", "Top Products"), ("top_countries", "Top Countries"), ("daily_orders", "Daily Orders")]}
+        return generate_pdf_report(ctx["clean"], rules=ctx["rules"], sim_df=ctx["sim_df"], cleaning_options=CLEANING_OPTIONS,
+                                   filename="bench_report.pdf", general_plots=general_plots,
+                                   recommendation_plots={"Similarity Heatmap": paths["similarity_heatmap"]},
+                                   evaluation_stats={"similarity_hist_path": paths["similarity_hist"],
+                                                     "similarity_quantiles": figures["similarity_hist"][1][3]},
+                                   summary=summary, directory=figure_dir)
+
+# (name, function of the context, context key for the result) in dependency order
+STAGES = [
+    ("clean_data", lambda ctx: clean_data(ctx["raw"], CLEANING_OPTIONS), "clean"),
+    ("generate_association_rules", lambda ctx: generate_association_rules(ctx["clean"], **RULE_PARAMS), "rules"),
+    ("generate_similarity_matrix", lambda ctx: generate_similarity_matrix(ctx["clean"], sparse=True), "sim_df"),
+    ("build_similarity_scores", lambda ctx: build_similarity_scores(ctx["sim_df"]), None),
+    ("plot_top_products", lambda ctx: _plot(lambda: plot_top_products(ctx["clean"])), None),
+    ("plot_top_countries", lambda ctx: _plot(lambda: plot_top_countries(ctx["clean"])), None),
+    ("plot_daily_orders", lambda ctx: _plot(lambda: plot_daily_orders(ctx["clean"][["InvoiceDate", "InvoiceNo"]].copy())), None),
+    ("generate_pdf_report", _report, None),
+]
+
+def measure(stage, ctx, track_memory=True):
+    # Timed without tracing; peak memory comes from a second, traced run of the same stage
+    gc.collect()
+    start = time.perf_counter()
+    result = stage(ctx)
+    timing = {"seconds": time.perf_counter() - start}
+    if track_memory:
+        gc.collect()
+        tracemalloc.start()
+        stage(ctx)
+        timing["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        tracemalloc.stop()
+    return result, timing
+
+def run_benchmarks(scales, track_memory=True, seed=0):
+    results = {}
+    for n_rows in scales:
+        ctx = {"raw": generate_transactions(n_rows, seed=seed, text_dates=True)}
+        results[str(n_rows)] = {}
+        for name, stage, key in STAGES:
+            result, timing = measure(stage, ctx, track_memory)
+            if key:
+                ctx[key] = result
+            results[str(n_rows)][name] = timing
+            memory = f"{timing['peak_mb']:9.1f} MB" if "peak_mb" in timing else ""
+            print(f"{n_rows:>10,} rows  {name:<28} {timing['seconds']:9.3f} s {memory}", flush=True)
+    return results
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for scale, stages in results.items():
+        for name, timing in stages.items():
+            base = baseline.get("results", {}).get(scale, {}).get(name)
+            if not base:
+                continue
+            for metric, floor in (("seconds", MIN_SECONDS_DELTA), ("peak_mb", MIN_MB_DELTA)):
+                if metric in timing and metric in base:
+                    now, before = timing[metric], base[metric]
+                    if now > before * (1 + tolerance) and now - before > floor:
+                        regressions.append(f"{scale} rows {name}: {metric} {before:.3f} -> {now:.3f}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the retail recommender stages on synthetic data.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown or growth")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the traced peak-memory runs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.scales, track_memory=not args.no_memory, seed=args.seed)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"machine": platform.platform(), "python": platform.python_version(), "results": results}, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    print(f"{len(regressions)} regression(s) against {args.baseline}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
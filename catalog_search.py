@@ -0,0 +1,83 @@
+import bisect
+import numpy as np
+import pandas as pd
+
+def _trigrams(text):
+    # Padded so short queries and word starts still produce grams ("  m", " mu", "mug", "ug ")
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _normalize(text):
+    return " ".join(str(text).lower().split())
+
+class CatalogIndex:
+    # Typeahead over item labels: prefix matches from a sorted array, fuzzy matches from
+    # character trigram posting lists ranked by Jaccard similarity. Item ids are positions in
+    # `labels`, so building it from the recommender's item index shares the recommender's ids.
+    def __init__(self, labels):
+        self.labels = pd.Index(labels)
+        normalized = [_normalize(label) for label in self.labels]
+        self._normalized = normalized
+
+        # Prefix search: normalized labels in sorted order, mapped back to item ids
+        self._prefix_order = np.argsort(np.asarray(normalized, dtype=object), kind="stable")
+        self._sorted = [normalized[i] for i in self._prefix_order]
+
+        grams_per_item = [_trigrams(text) for text in normalized]
+        self._gram_ids = {}
+        item_of_gram, gram_of_item = [], []
+        for item, grams in enumerate(grams_per_item):
+            for gram in grams:
+                gram_of_item.append(self._gram_ids.setdefault(gram, len(self._gram_ids)))
+                item_of_gram.append(item)
+        gram_of_item = np.asarray(gram_of_item, dtype=np.int64)
+        order = np.argsort(gram_of_item, kind="stable")
+        # postings[postings_ptr[g]:postings_ptr[g + 1]] are the ids of the items containing gram g
+        self.postings = np.asarray(item_of_gram, dtype=np.int32)[order]
+        self.postings_ptr = np.searchsorted(gram_of_item[order], np.arange(len(self._gram_ids) + 1))
+        self.gram_counts = np.fromiter((len(grams) for grams in grams_per_item), dtype=np.int32, count=len(self.labels))
+
+    def __len__(self):
+        return len(self.labels)
+
+    def prefix_ids(self, prefix, limit=20):
+        prefix = _normalize(prefix)
+        start = bisect.bisect_left(self._sorted, prefix)
+        end = start
+        while end < len(self._sorted) and end - start < limit and self._sorted[end].startswith(prefix):
+            end += 1
+        return self._prefix_order[start:end]
+
+    def fuzzy_ids(self, query, limit=20):
+        # Returns (ids, Jaccard scores) of the best trigram matches, best first
+        query_grams = _trigrams(_normalize(query))
+        grams = [self._gram_ids[gram] for gram in query_grams if gram in self._gram_ids]
+        if not grams:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        hits = np.concatenate([self.postings[self.postings_ptr[g]:self.postings_ptr[g + 1]] for g in grams])
+        shared = np.bincount(hits, minlength=len(self.labels))
+        candidates = np.flatnonzero(shared)
+        scores = shared[candidates] / (len(query_grams) + self.gram_counts[candidates] - shared[candidates])
+        if len(candidates) > limit:
+            best = np.argpartition(scores, -limit)[-limit:]
+            candidates, scores = candidates[best], scores[best]
+        order = np.argsort(-scores, kind="stable")
+        return candidates[order], scores[order]
+
+    def search(self, query, limit=20):
+        # Item ids ranked prefix matches first, then substring matches, each by trigram similarity
+        needle = _normalize(query)
+        if not needle:
+            return np.empty(0, dtype=np.int64)
+        fuzzy, scores = self.fuzzy_ids(needle, limit * 4)
+        ranked = dict(zip(fuzzy.tolist(), scores.tolist()))
+        for item in self.prefix_ids(needle, limit).tolist():
+            ranked.setdefault(item, 0.0)
+        for item in ranked:
+            text = self._normalized[item]
+            ranked[item] += 2.0 if text.startswith(needle) else 1.0 if needle in text else 0.0
+        ids = sorted(ranked, key=lambda item: (-ranked[item], self._normalized[item]))
+        return np.asarray(ids[:limit], dtype=np.int64)
+
+    def search_labels(self, query, limit=20):
+        return list(self.labels[self.search(query, limit)])
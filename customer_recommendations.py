@@ -0,0 +1,185 @@
+# customer_recommendations.py
+# Top-k recommendations for every customer at once: the sparse customer-item history is
+# multiplied by an item model (similarity matrix, top-k neighbour table, embeddings or rules)
+# one chunk of customers at a time, already bought items are masked out and the k best items per
+# customer are kept by partial selection. Chunks run in a process pool and are streamed to a
+# Parquet (or CSV) file in customer order, so memory stays O(chunk_size * items) per worker.
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from embeddings import ItemEmbeddings
+from instrumentation import span
+from neighbours import NeighbourTable
+from recommender import build_item_user_matrix
+from rule_index import RuleIndex
+
+def rule_item_matrix(rule_index):
+    # Item x item confidence of the best rule with the first item among its antecedents and the
+    # second among its consequents, as recommend_from_rules would rank them
+    n_antecedents = np.diff(rule_index.antecedent_ptr)
+    n_consequents = np.diff(rule_index.consequent_ptr)
+    pairs = n_antecedents * n_consequents
+    rule_of_pair = np.repeat(np.arange(len(pairs)), pairs)
+    within = np.arange(pairs.sum()) - np.repeat(np.cumsum(pairs) - pairs, pairs)
+    antecedents = rule_index.antecedent_ids[rule_index.antecedent_ptr[rule_of_pair] + within // n_consequents[rule_of_pair]]
+    consequents = rule_index.consequent_ids[rule_index.consequent_ptr[rule_of_pair] + within % n_consequents[rule_of_pair]]
+
+    # Rule ids run in descending confidence, so the first occurrence of a pair is its best rule
+    n_items = len(rule_index.items)
+    _, first = np.unique(antecedents.astype(np.int64) * n_items + consequents, return_index=True)
+    return sp.csr_matrix((rule_index.confidence[rule_of_pair[first]].astype(np.float32),
+                          (antecedents[first], consequents[first])), shape=(n_items, n_items))
+
+def item_model(model):
+    # (labels, left, right): a customer's scores are history @ left (@ right)
+    if isinstance(model, ItemEmbeddings):
+        return model.labels, model.vectors, np.ascontiguousarray(model.vectors.T)
+    if isinstance(model, NeighbourTable):
+        n_items, width = model.neighbours.shape
+        rows = np.repeat(np.arange(n_items), width)
+        scores = sp.csr_matrix((model.scores.ravel(), (rows, model.neighbours.ravel())), shape=(n_items, n_items))
+        return model.labels, scores, None
+    if isinstance(model, RuleIndex):
+        return model.items, rule_item_matrix(model), None
+    if isinstance(model, pd.DataFrame):
+        return model.columns, np.asarray(model.to_numpy(), dtype=np.float32), None
+    raise TypeError(f"Cannot score customers with a {type(model).__name__}")
+
+def customer_history(df, labels):
+    # Customers x model items, 1 where the customer bought the item; items the model does not
+    # know are dropped
+    item_user, items, customers = build_item_user_matrix(df)
+    positions = labels.get_indexer(items)
+    known = positions >= 0
+    bought = (item_user[known] > 0).T.tocsr()
+    # Columns renumbered into the model's item order
+    history = sp.csr_matrix((np.ones(bought.nnz, dtype=np.float32), positions[known][bought.indices], bought.indptr),
+                            shape=(len(customers), len(labels)))
+    history.sort_indices()
+    return history, customers
+
+def score_chunk(history, left, right, k):
+    # Top-k (item positions, scores) per row of history; -1 / nan where fewer than k items score
+    scores = history @ left
+    if right is not None:
+        scores = scores @ right
+    scores = scores.toarray() if sp.issparse(scores) else np.array(scores, dtype=np.float32)
+    scores[scores <= 0] = -np.inf
+    rows = np.repeat(np.arange(history.shape[0]), np.diff(history.indptr))
+    scores[rows, history.indices] = -np.inf
+
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((history.shape[0], 0), dtype=np.int64), np.empty((history.shape[0], 0), dtype=np.float32)
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind="stable")
+    items = np.take_along_axis(candidates, order, axis=1)
+    best = np.take_along_axis(candidate_scores, order, axis=1)
+    missing = ~np.isfinite(best)
+    items[missing], best[missing] = -1, np.nan
+    return items, best
+
+# Worker state: the history and model are shipped once per process, chunks are (start, stop) ranges
+_worker = {}
+
+def _init_worker(history, left, right, k):
+    _worker.update(history=history, left=left, right=right, k=k)
+
+def _score_range(start, stop):
+    return start, score_chunk(_worker["history"][start:stop], _worker["left"], _worker["right"], _worker["k"])
+
+def _chunk_frame(customers, labels, start, items, scores):
+    ranked = items >= 0
+    rows, ranks = np.nonzero(ranked)
+    return pd.DataFrame({
+        "CustomerID": np.asarray(customers)[start + rows],
+        "Rank": (ranks + 1).astype(np.int16),
+        "Item": np.asarray(labels, dtype=object)[items[ranked]],
+        "Score": scores[ranked].astype(np.float32)
+    })
+
+class _ChunkWriter:
+    # Appends chunk frames to one Parquet file (one row group per chunk) or CSV file
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._parquet = None
+        self._empty = None
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def write(self, frame):
+        if frame.empty:
+            # Column types of an empty chunk are unknown; kept only in case every chunk is empty
+            self._empty = frame
+            return
+        if self.path.endswith(".csv"):
+            frame.to_csv(self.path, mode="a" if self.rows else "w", header=not self.rows, index=False)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        self.rows += len(frame)
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+        elif not self.rows and self._empty is not None:
+            if self.path.endswith(".csv"):
+                self._empty.to_csv(self.path, index=False)
+            else:
+                self._empty.to_parquet(self.path, index=False)
+
+def recommend_for_customers(df, model, path, top_k=10, chunk_size=1024, n_jobs=None, max_pending=None):
+    # Writes (CustomerID, Rank, Item, Score) rows for every customer in df to path
+    labels, left, right = item_model(model)
+    history, customers = customer_history(df, labels)
+    n_jobs = n_jobs or os.cpu_count()
+    max_pending = max_pending or 2 * n_jobs
+    ranges = [(start, min(start + chunk_size, len(customers))) for start in range(0, len(customers), chunk_size)]
+
+    writer = _ChunkWriter(path)
+    with span("customer_recommendations", customers=len(customers), items=len(labels), k=top_k,
+              chunk_size=chunk_size, n_jobs=n_jobs) as record:
+        try:
+            if n_jobs == 1:
+                for start, stop in ranges:
+                    writer.write(_chunk_frame(customers, labels, start, *score_chunk(history[start:stop], left, right, top_k)))
+            else:
+                # Finished chunks wait in `done` until every chunk before them is written. Only chunks
+                # less than max_pending past the next one to write are submitted, so a slow chunk
+                # holds back at most max_pending results instead of all the later ones.
+                done, next_start, written = {}, 0, 0
+
+                def collect(finished):
+                    nonlocal next_start, written
+                    done.update(future.result() for future in finished)
+                    while next_start in done:
+                        items, scores = done.pop(next_start)
+                        writer.write(_chunk_frame(customers, labels, next_start, items, scores))
+                        next_start += len(items)
+                        written += 1
+
+                # spawn, not fork: callers may run this from a thread of a multithreaded server
+                with ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=_init_worker, initargs=(history, left, right, top_k)) as executor:
+                    pending = set()
+                    for index, (start, stop) in enumerate(ranges):
+                        while index - written >= max_pending:
+                            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                            collect(finished)
+                        pending.add(executor.submit(_score_range, start, stop))
+                    while pending:
+                        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(finished)
+        finally:
+            writer.close()
+        record["rows"] = writer.rows
+    return {"customers": len(customers), "rows": writer.rows, "path": path}
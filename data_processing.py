@@ -1,17 +1,86 @@
 
+import time
+import numpy as np
 import pandas as pd
+from instrumentation import span
 
-def clean_data(df, options):
-    if "Drop missing CustomerID or Description" in options:
-        df = df.dropna(subset=["CustomerID", "Description"])
-    if "Remove canceled transactions (InvoiceNo starts with 'C')" in options and "InvoiceNo" in df.columns:
-        df = df[~df['InvoiceNo'].astype(str).str.startswith("C")]
-    if "Filter Quantity and UnitPrice > 0" in options:
-        df = df[(df["Quantity"] > 0) & (df["UnitPrice"] > 0)]
-    if "Clean Description text" in options:
-        df["Description"] = df["Description"].str.lower().str.strip()
-    if "Convert InvoiceDate to datetime" in options:
-        df["InvoiceDate"] = pd.to_datetime(df["InvoiceDate"], errors="coerce")
-    if "Convert CustomerID to string" in options:
-        df["CustomerID"] = df["CustomerID"].astype(str)
+# Row filters: option -> (step name, columns it needs, function returning the rows to keep)
+ROW_FILTERS = {
+    "Drop missing CustomerID or Description": (
+        "dropna", ["CustomerID", "Description"],
+        lambda df: (df["CustomerID"].notna() & df["Description"].notna()).to_numpy()),
+    "Remove canceled transactions (InvoiceNo starts with 'C')": (
+        "remove_canceled", ["InvoiceNo"],
+        lambda df: ~_map_values(df["InvoiceNo"], lambda s: s.astype(str).str.startswith("C", na=False)).to_numpy(dtype=bool)),
+    "Filter Quantity and UnitPrice > 0": (
+        "positive_quantity_price", ["Quantity", "UnitPrice"],
+        lambda df: ((df["Quantity"] > 0) & (df["UnitPrice"] > 0)).to_numpy()),
+}
+# Column transforms: option -> (step name, column, function of the column)
+COLUMN_TRANSFORMS = {
+    "Clean Description text": ("description_text", "Description", lambda s: s.str.lower().str.strip()),
+    "Convert InvoiceDate to datetime": ("invoice_date", "InvoiceDate", lambda s: pd.to_datetime(s, errors="coerce")),
+    "Convert CustomerID to string": ("customer_id_string", "CustomerID", lambda s: s.astype(str)),
+}
+CLEANING_OPTIONS = list(ROW_FILTERS) + list(COLUMN_TRANSFORMS)
+
+def _map_values(values, transform):
+    # Categorical columns are transformed once per category instead of once per row
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        return transform(values)
+    codes = values.cat.codes.to_numpy()
+    mapped = transform(pd.Series(values.cat.categories))
+    if pd.api.types.is_string_dtype(mapped):
+        # Transformed labels may collide ("Mug " and "mug"), so re-factorize them and stay categorical
+        new_codes, uniques = pd.factorize(mapped)
+        codes = np.where(codes >= 0, new_codes[codes], -1)
+        return pd.Series(pd.Categorical.from_codes(codes, categories=uniques), index=values.index)
+    fill_value = False if mapped.dtype == bool else None
+    return pd.Series(mapped.array.take(codes, allow_fill=True, fill_value=fill_value), index=values.index)
+
+def build_cleaning_plan(options):
+    # Filters and transforms in a fixed order, whatever order the options were picked in
+    return {
+        "filters": [ROW_FILTERS[option] for option in ROW_FILTERS if option in options],
+        "transforms": [COLUMN_TRANSFORMS[option] for option in COLUMN_TRANSFORMS if option in options]
+    }
+
+def _record_step(report, name, rows_dropped, seconds):
+    if report is not None:
+        step = report.setdefault(name, {"rows_dropped": 0, "seconds": 0.0})
+        step["rows_dropped"] += int(rows_dropped)
+        step["seconds"] += seconds
+
+def cleaning_mask(df, plan, report=None):
+    # All of the plan's row filters combined into one boolean mask of the rows to keep
+    keep = np.ones(len(df), dtype=bool)
+    for name, columns, keep_rows in plan["filters"]:
+        if not all(col in df.columns for col in columns):
+            continue
+        with span(f"clean:{name}", rows_in=int(keep.sum())) as record:
+            start = time.perf_counter()
+            kept_before = keep.sum()
+            keep &= keep_rows(df)
+            record["rows_out"] = int(keep.sum())
+            _record_step(report, name, kept_before - record["rows_out"], time.perf_counter() - start)
+    return keep
+
+def apply_cleaning_plan(df, plan, report=None, keep=None):
+    # One boolean mask for all row filters, one selection, then each transform once on the survivors.
+    # Safe to call per chunk: the report accumulates rows dropped and seconds per step.
+    if keep is None:
+        keep = cleaning_mask(df, plan, report)
+
+    # The selection is a new frame, so the transforms below never write into the caller's data
+    df = (df.loc[keep] if not keep.all() else df).copy(deep=False)
+    for name, column, transform in plan["transforms"]:
+        if column not in df.columns:
+            continue
+        with span(f"clean:{name}", rows_in=len(df), rows_out=len(df)):
+            start = time.perf_counter()
+            df[column] = _map_values(df[column], transform)
+            _record_step(report, name, 0, time.perf_counter() - start)
     return df
+
+def clean_data(df, options, report=None):
+    return apply_cleaning_plan(df, build_cleaning_plan(options), report)
@@ -0,0 +1,101 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import urllib.request
+import pyarrow.parquet as pq
+from ingestion import read_retail_csv
+
+DATASET_DIR = "dataset_cache"
+# Part of every cache key; bump it when ingestion changes the stored dtypes
+SCHEMA_VERSION = 2
+
+# Columns each stage actually reads, so reloads can skip the rest of the file
+STAGE_COLUMNS = {
+    "recommender": ["InvoiceNo", "CustomerID", "Description", "Quantity"],
+    "plots": ["Description", "Country", "InvoiceDate", "InvoiceNo"],
+    "evaluation": ["InvoiceNo", "CustomerID", "Description", "Quantity", "InvoiceDate"],
+}
+
+def _url_version(url):
+    # ETag / Last-Modified from a HEAD request: they change whenever the remote file does
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, method="HEAD"), timeout=10) as response:
+            headers = response.headers
+    except (OSError, ValueError):
+        return None
+    version = [headers.get(name) for name in ("ETag", "Last-Modified", "Content-Length")]
+    return version if version[0] or version[1] else None
+
+def resolve_source(source):
+    # (source to read, content fingerprint). A URL whose server reports no version is downloaded
+    # once and hashed; the downloaded bytes are then what gets read.
+    if not hasattr(source, "getbuffer") and not os.path.exists(source):
+        version = _url_version(source)
+        if version is not None:
+            return source, hashlib.sha256(json.dumps([str(source), version]).encode()).hexdigest()
+        with urllib.request.urlopen(source, timeout=60) as response:
+            source = io.BytesIO(response.read())
+    return source, source_fingerprint(source)
+
+def source_fingerprint(source):
+    # Content hash of an upload buffer or a local file; URLs go through resolve_source
+    digest = hashlib.sha256()
+    if hasattr(source, "getbuffer"):
+        # In-memory uploads are hashed without copying
+        digest.update(source.getbuffer())
+    else:
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+def _dump_json(value, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(value, f)
+
+def _write_atomic(path, write):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def dataset_path(key):
+    return os.path.join(DATASET_DIR, f"{key}.parquet")
+
+def read_columns(path, columns=None):
+    # Memory-mapped read of just the requested columns; categoricals come back as categoricals
+    table = pq.read_table(path, columns=columns, memory_map=True)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+def load_dataset(source, columns=None, options=None, chunksize=200_000):
+    # First load ingests the CSV and writes it as Parquet under its content hash;
+    # later loads of the same content skip CSV parsing entirely
+    source, fingerprint = resolve_source(source)
+    key = hashlib.sha256(f"{SCHEMA_VERSION}|{fingerprint}|{sorted(options or [])}".encode()).hexdigest()
+    path = dataset_path(key)
+    if not os.path.exists(path):
+        if hasattr(source, "seek"):
+            source.seek(0)
+        df, report = read_retail_csv(source, options=options, chunksize=chunksize)
+        report["fingerprint"] = fingerprint
+        os.makedirs(DATASET_DIR, exist_ok=True)
+        # The ingestion report is written first, so a visible Parquet file always has one. Both go
+        # through a unique temporary file, so concurrent loads of one file never publish a torn copy.
+        _write_atomic(f"{path}.json", lambda tmp_path: _dump_json(report, tmp_path))
+        _write_atomic(path, lambda tmp_path: df.to_parquet(tmp_path, index=False))
+    else:
+        with open(f"{path}.json", encoding="utf-8") as f:
+            report = json.load(f)
+        report["fingerprint"] = fingerprint
+    return read_columns(path, columns), report
+
+def clear_datasets():
+    if os.path.exists(DATASET_DIR):
+        shutil.rmtree(DATASET_DIR)
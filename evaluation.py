@@ -0,0 +1,180 @@
+# evaluation.py
+# Offline evaluation on held-out purchases: transactions are split at an InvoiceDate cutoff, models
+# are trained on the earlier part and each customer's top-k list (scored as in
+# customer_recommendations) is checked against the items they bought for the first time afterwards.
+# Hits are looked up in a sparse customer x item truth matrix, one chunk of customers per task.
+# Usage: python evaluation.py --input data.csv [--k 10] [--test-fraction 0.2]
+#                             [--min-support 0.01 0.02] [--top-n-items 200 500] [--n-jobs 4]
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from customer_recommendations import item_model, score_chunk
+from instrumentation import progress, span
+from neighbours import NeighbourTable, top_k_neighbours
+from recommender import NoFrequentItemsets, build_item_user_matrix, generate_association_rules
+from rule_index import RuleIndex
+
+RULE_COLUMNS = ["antecedents", "consequents", "support", "confidence", "lift"]
+# The pipeline's rule settings; a sweep overrides min_support / top_n_items
+RULE_PARAMS = {"top_n_items": None, "min_support": 0.01, "max_len": 3, "algorithm": "fpgrowth", "sparse": True}
+
+def _purchases(df, customers, items):
+    # Customers x items, 1 where the net quantity bought is positive
+    rows = customers.get_indexer(df["CustomerID"])
+    cols = items.get_indexer(df["Description"])
+    keep = (rows >= 0) & (cols >= 0)
+    quantity = df["Quantity"].fillna(0).to_numpy(dtype=np.float64)[keep]
+    summed = sp.csr_matrix((quantity, (rows[keep], cols[keep])), shape=(len(customers), len(items)))
+    return (summed > 0).astype(np.float32)
+
+class HoldoutSplit:
+    # Train/test split at an InvoiceDate cutoff, with the matrices every model is scored against:
+    # history (train purchases) and truth (test purchases of items not bought before the cutoff)
+    def __init__(self, df, test_fraction=0.2, cutoff=None):
+        dates = pd.to_datetime(df["InvoiceDate"], errors="coerce")
+        valid = dates.notna() & df["CustomerID"].notna() & df["Description"].notna()
+        df, dates = df.loc[valid], dates[valid]
+        self.cutoff = pd.Timestamp(cutoff) if cutoff is not None else dates.quantile(1 - test_fraction)
+        before = (dates < self.cutoff).to_numpy()
+        self.train, self.test = df.loc[before], df.loc[~before]
+
+        # Customers who bought before and bought something new after the cutoff
+        self.items = pd.Index(pd.unique(self.train["Description"])).sort_values()
+        all_items = self.items.append(pd.Index(pd.unique(self.test["Description"])).difference(self.items))
+        customers = pd.Index(pd.unique(self.train["CustomerID"])).intersection(pd.unique(self.test["CustomerID"]))
+        history = _purchases(self.train, customers, all_items)
+        novel = _purchases(self.test, customers, all_items) - history
+        novel.data = np.maximum(novel.data, 0)
+        novel.eliminate_zeros()
+        truth_count = np.diff(novel.indptr)
+        evaluated = truth_count > 0
+        self.customers = customers[evaluated]
+        self.truth_count = truth_count[evaluated]
+        self._history = history[evaluated][:, :len(self.items)].tocsr()
+        self._truth = novel[evaluated][:, :len(self.items)].tocsr()
+
+    def matrices(self, labels):
+        # History and truth with the columns in a model's item order (labels are train items)
+        columns = self.items.get_indexer(labels)
+        return self._history[:, columns].tocsr(), self._truth[:, columns].tocsr()
+
+# Worker state: the split matrices and model are shipped once per process
+_worker = {}
+
+def _init_worker(history, truth, truth_count, left, right, k):
+    _worker.update(history=history, truth=truth, truth_count=truth_count, left=left, right=right, k=k)
+
+def _evaluate_range(start, stop):
+    w = _worker
+    return evaluate_chunk(w["history"][start:stop], w["truth"][start:stop], w["truth_count"][start:stop], w["left"], w["right"], w["k"])
+
+def evaluate_chunk(history, truth, truth_count, left, right, k):
+    # Sums of the per-customer metrics over the chunk, plus which items were recommended
+    items, _ = score_chunk(history, left, right, k)
+    ranked = items >= 0
+    rows = np.nonzero(ranked)[0]
+    hit = np.zeros(items.shape, dtype=bool)
+    hit[ranked] = np.asarray(truth[rows, items[ranked]]).ravel() > 0
+    hits = hit.sum(axis=1)
+    recommended = np.zeros(truth.shape[1], dtype=bool)
+    recommended[items[ranked]] = True
+    return {"precision": hits.sum() / k, "recall": (hits / truth_count).sum(), "hits": int((hits > 0).sum()),
+            "recommended": recommended}
+
+def evaluate_recommender(model, split, k=10, chunk_size=2048, n_jobs=None):
+    # precision@k, recall@k, hit rate (share of customers with at least one hit) and catalog coverage
+    labels, left, right = item_model(model)
+    history, truth = split.matrices(labels)
+    n_customers = history.shape[0]
+    n_jobs = n_jobs or os.cpu_count()
+    starts = list(range(0, n_customers, chunk_size))
+    stops = [min(start + chunk_size, n_customers) for start in starts]
+
+    with span("evaluate", model=type(model).__name__, customers=n_customers, items=len(labels), k=k, n_jobs=n_jobs):
+        results = []
+        if n_jobs == 1 or len(starts) < 2:
+            for start, stop in zip(starts, stops):
+                progress(start / max(n_customers, 1))
+                results.append(evaluate_chunk(history[start:stop], truth[start:stop], split.truth_count[start:stop], left, right, k))
+        else:
+            # spawn, not fork: the app evaluates from a job thread of a multithreaded server
+            executor = ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context("spawn"),
+                                           initializer=_init_worker, initargs=(history, truth, split.truth_count, left, right, k))
+            try:
+                for result in executor.map(_evaluate_range, starts, stops):
+                    progress(len(results) / len(starts))
+                    results.append(result)
+            finally:
+                # A cancelled checkpoint drops the chunks still queued instead of waiting for them
+                executor.shutdown(cancel_futures=True)
+
+    recommended = np.zeros(len(labels), dtype=bool)
+    for result in results:
+        recommended |= result["recommended"]
+    n = max(n_customers, 1)
+    return {
+        "customers": n_customers,
+        f"precision@{k}": sum(result["precision"] for result in results) / n,
+        f"recall@{k}": sum(result["recall"] for result in results) / n,
+        "hit_rate": sum(result["hits"] for result in results) / n,
+        "coverage": int(recommended.sum()) / max(len(split.items), 1)
+    }
+
+def train_rules(train, **params):
+    try:
+        rules = generate_association_rules(train, **{**RULE_PARAMS, **params})
+    except NoFrequentItemsets:
+        rules = pd.DataFrame(columns=RULE_COLUMNS)
+    return RuleIndex(rules)
+
+def train_neighbours(train, top_k=50, block_size=1024):
+    item_user, items, _ = build_item_user_matrix(train)
+    _, neighbours, scores = top_k_neighbours(item_user, k=top_k, block_size=block_size)
+    return NeighbourTable(items, neighbours, scores)
+
+def evaluate_models(df, k=10, test_fraction=0.2, rule_grid=None, similarity_top_k=50, chunk_size=2048, n_jobs=None):
+    # One row per model: the similarity model and the rule model at every rule_grid setting, e.g.
+    # rule_grid=[{"min_support": 0.01}, {"min_support": 0.02, "top_n_items": 500}]
+    split = HoldoutSplit(df, test_fraction)
+    rows = []
+    candidates = [("similarity", {"top_k": similarity_top_k}, train_neighbours)]
+    candidates += [("rules", settings, train_rules) for settings in (rule_grid or [{}])]
+    for name, settings, train in candidates:
+        start = time.perf_counter()
+        model = train(split.train, **settings)
+        trained = time.perf_counter() - start
+        metrics = evaluate_recommender(model, split, k=k, chunk_size=chunk_size, n_jobs=n_jobs)
+        size = len(model) if isinstance(model, RuleIndex) else len(model.labels)
+        rows.append({"model": name, "settings": settings, "size": size, **metrics,
+                     "train_s": trained, "evaluate_s": time.perf_counter() - start - trained})
+    results = pd.DataFrame(rows)
+    results.attrs.update(cutoff=str(split.cutoff), k=k, train_rows=len(split.train), test_rows=len(split.test))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score the rule and similarity models on held-out purchases.")
+    parser.add_argument("--input", required=True, help="CSV dataset to evaluate on")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--test-fraction", type=float, default=0.2, help="Share of the transactions (by InvoiceDate) held out")
+    parser.add_argument("--min-support", type=float, nargs="+", default=[RULE_PARAMS["min_support"]])
+    parser.add_argument("--top-n-items", type=int, nargs="+", default=[None], help="Items kept for rule mining")
+    parser.add_argument("--n-jobs", type=int)
+    args = parser.parse_args(argv)
+
+    from dataset_store import load_dataset, STAGE_COLUMNS
+    from pipeline import DEFAULT_CONFIG
+    df, _ = load_dataset(args.input, columns=STAGE_COLUMNS["evaluation"], options=DEFAULT_CONFIG["cleaning"])
+    grid = [{"min_support": support, "top_n_items": top_n} for support, top_n in itertools.product(args.min_support, args.top_n_items)]
+    results = evaluate_models(df, k=args.k, test_fraction=args.test_fraction, rule_grid=grid, n_jobs=args.n_jobs)
+    print(json.dumps(results.attrs))
+    print(results.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
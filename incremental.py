@@ -0,0 +1,191 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+class _Vocabulary:
+    # Append-only label -> integer id mapping, so existing matrix rows never move
+    def __init__(self):
+        self.ids = {}
+        self.labels = []
+
+    def encode(self, values):
+        codes, uniques = pd.factorize(values)
+        mapped = np.empty(len(uniques), dtype=np.int64)
+        for position, value in enumerate(uniques):
+            code = self.ids.get(value)
+            if code is None:
+                code = self.ids[value] = len(self.labels)
+                self.labels.append(value)
+            mapped[position] = code
+        return mapped[codes]
+
+    def __len__(self):
+        return len(self.labels)
+
+def _grow(matrix, shape):
+    matrix = matrix.tocsr()
+    matrix.resize(shape)
+    return matrix
+
+class _DeltaMatrix:
+    # A CSR base plus the COO blocks added since it was last merged (duplicates sum on merge).
+    # Blocks are folded in once they hold merge_ratio of the base's entries, or when the full matrix
+    # is read, so an update costs O(batch) instead of a copy of the whole matrix.
+    def __init__(self, dtype=np.float64, merge_ratio=0.25, min_merge=100_000):
+        self.base = sp.csr_matrix((0, 0), dtype=dtype)
+        self.shape = (0, 0)
+        self.merge_ratio = merge_ratio
+        self.min_merge = min_merge
+        self.blocks = []
+        self.pending = 0
+
+    def add(self, rows, cols, data, shape):
+        self.shape = shape
+        self.blocks.append((np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64),
+                            np.asarray(data, dtype=self.base.dtype)))
+        self.pending += len(data)
+        if self.pending > max(self.min_merge, self.merge_ratio * self.base.nnz):
+            self.merge()
+
+    def _pending(self):
+        if not self.blocks:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0, dtype=self.base.dtype)
+        return tuple(np.concatenate(parts) for parts in zip(*self.blocks))
+
+    def merge(self):
+        if self.blocks or self.base.shape != self.shape:
+            rows, cols, data = self._pending()
+            merged = _grow(self.base, self.shape) + sp.csr_matrix((data, (rows, cols)), shape=self.shape)
+            merged.eliminate_zeros()
+            self.base, self.blocks, self.pending = merged.tocsr(), [], 0
+        return self.base
+
+    def rows(self, positions):
+        # Current values of the given (sorted, unique) rows, without merging
+        in_base = positions < self.base.shape[0]
+        part = self.base[positions[in_base]].tocoo()
+        rows, cols, data = self._pending()
+        keep = np.isin(rows, positions)
+        return sp.csr_matrix((np.concatenate([part.data, data[keep]]),
+                              (np.concatenate([np.flatnonzero(in_base)[part.row], np.searchsorted(positions, rows[keep])]),
+                               np.concatenate([part.col, cols[keep]]))),
+                             shape=(len(positions), self.shape[1]))
+
+class IncrementalRecommender:
+    # Keeps the sufficient statistics of both recommenders and folds in new transactions:
+    #   item_user    item x customer quantity sums (cosine similarity and its norms)
+    #   invoice_item invoice x item quantity sums (basket membership is sum > 0)
+    #   cooccurrence item x item count of invoices containing both items; the diagonal is the
+    #                per-item invoice count, so pair rule metrics follow directly
+    # Each is a _DeltaMatrix: update() only appends the batch's entries and reads the rows it touches.
+    def __init__(self):
+        self.items = _Vocabulary()
+        self.customers = _Vocabulary()
+        self.invoices = _Vocabulary()
+        self._item_user = _DeltaMatrix()
+        self._invoice_item = _DeltaMatrix()
+        self._cooccurrence = _DeltaMatrix(dtype=np.int64)
+        self.norms_sq = np.zeros(0)
+        self.has_customers = np.zeros(0, dtype=bool)
+
+    @property
+    def item_user(self):
+        return self._item_user.merge()
+
+    @property
+    def invoice_item(self):
+        return self._invoice_item.merge()
+
+    @property
+    def cooccurrence(self):
+        return self._cooccurrence.merge()
+
+    def update(self, df):
+        # Codes for the new rows; the delta only touches the items and invoices it contains
+        basket_rows = df[df['InvoiceNo'].notna() & df['Description'].notna()]
+        user_rows = basket_rows[basket_rows['CustomerID'].notna()]
+        invoice_codes = self.invoices.encode(basket_rows['InvoiceNo'].to_numpy())
+        basket_item_codes = self.items.encode(basket_rows['Description'].to_numpy())
+        user_item_codes = self.items.encode(user_rows['Description'].to_numpy())
+        user_codes = self.customers.encode(user_rows['CustomerID'].to_numpy())
+        n_items = len(self.items)
+
+        # Cosine statistics: add the quantity delta and refresh the norms of touched items
+        self._item_user.add(user_item_codes, user_codes, user_rows['Quantity'].fillna(0).to_numpy(dtype=np.float64),
+                            (n_items, len(self.customers)))
+        self.norms_sq = np.concatenate([self.norms_sq, np.zeros(n_items - len(self.norms_sq))])
+        self.has_customers = np.concatenate([self.has_customers, np.zeros(n_items - len(self.has_customers), dtype=bool)])
+        touched_items = np.unique(user_item_codes)
+        self.has_customers[touched_items] = True
+        self.norms_sq[touched_items] = np.asarray(self._item_user.rows(touched_items).power(2).sum(axis=1)).ravel()
+
+        # Basket statistics: swap the touched invoices' old membership for the new one
+        touched_invoices = np.unique(invoice_codes)
+        before = _grow((self._invoice_item.rows(touched_invoices) > 0).astype(np.int64), (len(touched_invoices), n_items))
+        self._invoice_item.add(invoice_codes, basket_item_codes, basket_rows['Quantity'].fillna(0).to_numpy(dtype=np.float64),
+                               (len(self.invoices), n_items))
+        after = (self._invoice_item.rows(touched_invoices) > 0).astype(np.int64)
+        delta = ((after.T @ after) - (before.T @ before)).tocoo()
+        self._cooccurrence.add(delta.row, delta.col, delta.data, (n_items, n_items))
+        return self
+
+    @property
+    def item_labels(self):
+        return pd.Index(self.items.labels, name='Description')
+
+    def similar_items(self, item_name, top_n=5):
+        position = self.items.ids.get(item_name)
+        if position is None or not self.has_customers[position]:
+            return None
+        dots = np.asarray((self.item_user @ self.item_user[position].T).todense()).ravel()
+        norms = np.sqrt(self.norms_sq)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = np.where(norms * norms[position] > 0, dots / (norms * norms[position]), 0.0)
+        scores[~self.has_customers] = -np.inf
+        scores[position] = -np.inf
+        candidates = np.flatnonzero(np.isfinite(scores))
+        best = candidates[np.argsort(-scores[candidates], kind="stable")[:top_n]]
+        return pd.Series(scores[best], index=self.item_labels[best])
+
+    def similarity_matrix(self):
+        # Same frame as generate_similarity_matrix on the full history
+        positions = np.flatnonzero(self.has_customers)
+        positions = positions[np.argsort(np.asarray(self.items.labels, dtype=object)[positions])]
+        vectors = self.item_user[positions]
+        norms = np.sqrt(self.norms_sq[positions])
+        norms[norms == 0] = 1.0
+        similarity = ((vectors @ vectors.T).toarray() / np.outer(norms, norms)).astype(np.float32)
+        labels = self.item_labels[positions]
+        return pd.DataFrame(similarity, index=labels, columns=labels)
+
+    def rules(self, min_support=0.01, min_lift=1.0):
+        # Single-item rules, matching generate_association_rules(df, top_n_items=None, max_len=2)
+        n_invoices = len(self.invoices)
+        counts = self.cooccurrence.diagonal()
+        pairs = sp.triu(self.cooccurrence, k=1).tocoo()
+        keep = pairs.data >= min_support * n_invoices
+        rows, cols, together = pairs.row[keep], pairs.col[keep], pairs.data[keep]
+
+        # Each frequent pair gives a rule in both directions
+        antecedents = np.concatenate([rows, cols])
+        consequents = np.concatenate([cols, rows])
+        together = np.concatenate([together, together])
+        support = together / n_invoices
+        antecedent_support = counts[antecedents] / n_invoices
+        consequent_support = counts[consequents] / n_invoices
+        confidence = support / antecedent_support
+        lift = confidence / consequent_support
+
+        keep = lift >= min_lift
+        labels = self.items.labels
+        rules = pd.DataFrame({
+            "antecedents": [frozenset([labels[i]]) for i in antecedents[keep]],
+            "consequents": [frozenset([labels[i]]) for i in consequents[keep]],
+            "antecedent support": antecedent_support[keep],
+            "consequent support": consequent_support[keep],
+            "support": support[keep],
+            "confidence": confidence[keep],
+            "lift": lift[keep]
+        })
+        return rules.sort_values(by="confidence", ascending=False)
@@ -0,0 +1,74 @@
+import pandas as pd
+from pandas.api.types import union_categoricals
+from data_processing import apply_cleaning_plan, build_cleaning_plan
+from instrumentation import span
+
+# Declared schema of the Online Retail layout; columns missing from a file are skipped.
+# Only whole numbers are downcast: float32 would turn a price of 4.15 into 4.150000095 and
+# cannot hold every CustomerID exactly, so UnitPrice and CustomerID keep the dtype they are read as.
+STRING_COLUMNS = ["InvoiceNo", "StockCode", "Description", "Country"]
+NUMERIC_COLUMNS = {"Quantity": "integer", "UnitPrice": None, "CustomerID": None}
+DATE_COLUMNS = ["InvoiceDate"]
+
+def categorize_strings(df):
+    # Repeated strings become categoricals
+    for col in df.columns:
+        if col in STRING_COLUMNS or (col in NUMERIC_COLUMNS and not pd.api.types.is_numeric_dtype(df[col])):
+            # CustomerID lands here once clean_data has converted it to strings
+            df[col] = df[col].astype("category")
+    return df
+
+def downcast_numbers(df):
+    # Integer columns to the smallest dtype that holds them; run on the whole frame, so every
+    # chunk of a file ends up with the same dtype
+    for col, downcast in NUMERIC_COLUMNS.items():
+        if downcast and col in df.columns and pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast=downcast)
+    return df
+
+def optimize_dtypes(df):
+    return downcast_numbers(categorize_strings(df))
+
+def _unify_categories(chunks):
+    # Chunks only concatenate as categoricals when they share identical categories
+    for col in chunks[0].columns:
+        if isinstance(chunks[0][col].dtype, pd.CategoricalDtype):
+            categories = union_categoricals([chunk[col] for chunk in chunks], sort_categories=True).categories
+            for chunk in chunks:
+                chunk[col] = chunk[col].cat.set_categories(categories)
+    return chunks
+
+def read_retail_csv(source, options=None, chunksize=200_000, date_format=None):
+    # Read in chunks, run one cleaning plan on every chunk so dropped rows never accumulate,
+    # and store every chunk with the compact schema dtypes
+    report = {"chunks": 0, "rows_read": 0, "rows_kept": 0, "raw_bytes": 0, "bytes": 0, "cleaning": {}}
+    plan = build_cleaning_plan(options or [])
+    chunks = []
+    dtypes = {col: str for col in STRING_COLUMNS}
+    with span("ingestion", chunksize=chunksize) as record:
+        try:
+            reader = pd.read_csv(source, chunksize=chunksize, dtype=dtypes)
+        except pd.errors.EmptyDataError:
+            reader = []  # not even a header line
+        for chunk in reader:
+            report["chunks"] += 1
+            report["rows_read"] += len(chunk)
+            report["raw_bytes"] += int(chunk.memory_usage(deep=True).sum())
+
+            for col in DATE_COLUMNS:
+                if col in chunk.columns:
+                    chunk[col] = pd.to_datetime(chunk[col], format=date_format, errors="coerce")
+            chunk = apply_cleaning_plan(chunk, plan, report["cleaning"])
+            chunk = categorize_strings(chunk)
+
+            report["rows_kept"] += len(chunk)
+            chunks.append(chunk)
+
+        if chunks:
+            df = downcast_numbers(pd.concat(_unify_categories(chunks), ignore_index=True))
+        else:
+            df = pd.DataFrame(columns=STRING_COLUMNS + list(NUMERIC_COLUMNS) + DATE_COLUMNS)
+        report["bytes"] = int(df.memory_usage(deep=True).sum())
+        report["saved_bytes"] = report["raw_bytes"] - report["bytes"]
+        record.update(report, rows=report["rows_read"])
+    return df, report
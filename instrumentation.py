@@ -0,0 +1,134 @@
+# instrumentation.py
+# Buffered, thread-safe timing spans and counters, written as JSON lines to logs/events.jsonl.
+#
+#   with span("basket", items=n) as record:
+#       ...
+#       record["rows"] = len(df)   # extra fields are added to the emitted event
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+LOG_DIR = "logs"
+EVENTS_PATH = os.path.join(LOG_DIR, "events.jsonl")
+
+def peak_rss_mb():
+    # High-water mark of this process; ru_maxrss is KB on Linux and bytes on macOS
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+class BufferedWriter:
+    # Appends lines to a file in batches instead of opening it on every call
+    def __init__(self, path, flush_every=50, flush_interval=5.0):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._lines = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def write(self, line):
+        with self._lock:
+            self._lines.append(line)
+            if len(self._lines) >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if self._lines:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(self._lines))
+            self._lines = []
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+class Instrumentation:
+    def __init__(self, path=EVENTS_PATH, **writer_options):
+        self.writer = BufferedWriter(path, **writer_options)
+        self.counters = {}
+        self.listeners = []
+        self.progress_listeners = []
+        self._lock = threading.Lock()
+        atexit.register(self.emit_counters)
+
+    def emit(self, event):
+        event.setdefault("ts", datetime.now().isoformat(timespec="milliseconds"))
+        event.setdefault("pid", os.getpid())
+        self.writer.write(json.dumps(event, default=str) + "\n")
+
+    def add_listener(self, listener):
+        # listener(name, fields) is called as each span starts; exceptions it raises abort the span
+        self.listeners.append(listener)
+
+    def add_progress_listener(self, listener):
+        # listener(fraction) is called from inside long loops; raising from it stops the loop
+        self.progress_listeners.append(listener)
+
+    def progress(self, fraction):
+        # Checkpoint for long stages: how far the innermost running stage is, from 0 to 1
+        for listener in self.progress_listeners:
+            listener(fraction)
+
+    @contextmanager
+    def span(self, name, **fields):
+        for listener in self.listeners:
+            listener(name, fields)
+        record = dict(fields)
+        rss_before = peak_rss_mb()
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield record
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            peak = peak_rss_mb()
+            self.emit({
+                "type": "span",
+                "name": name,
+                "status": status,
+                "seconds": round(time.perf_counter() - start, 6),
+                "peak_rss_mb": peak,
+                "peak_rss_growth_mb": None if peak is None else round(peak - rss_before, 3),
+                "thread": threading.current_thread().name,
+                **record
+            })
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def emit_counters(self):
+        with self._lock:
+            counters = dict(self.counters)
+        if counters:
+            self.emit({"type": "counters", "counters": counters})
+            self.writer.flush()
+
+    def flush(self):
+        self.writer.flush()
+
+_default = Instrumentation()
+span = _default.span
+count = _default.count
+emit = _default.emit
+flush = _default.flush
+add_listener = _default.add_listener
+add_progress_listener = _default.add_progress_listener
+progress = _default.progress
@@ -0,0 +1,172 @@
+# job_runner.py
+# Background jobs for long computations (rule mining, similarity models, evaluation, the PDF), so
+# the Streamlit script thread only submits work and polls it. Jobs are keyed by dataset and
+# parameters: an identical request from any session joins the job already queued, running or
+# finished instead of starting another, and finished results stay available until evicted.
+#
+#   job = runner.submit(f"{data_key}|rules", compute, df, label="Association rules")
+#   job.status, job.progress, job.message   # "pending" / "running" / "done" / "failed" / "cancelled"
+#   job.cancel()
+#
+# Cancellation is cooperative: a cancelled job stops at its next report_progress() call. Every
+# instrumentation span start and every progress() checkpoint inside a long loop (similarity and
+# top-k blocks, evaluation chunks) is one. A key cannot be resubmitted until its cancelled worker
+# has actually stopped, so a cancelled computation never runs twice side by side.
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from instrumentation import add_listener, add_progress_listener, count, span
+
+class JobCancelled(Exception):
+    pass
+
+class JobStillStopping(RuntimeError):
+    # Raised by submit() while the cancelled job under the same key has not reached a checkpoint yet
+    pass
+
+_current = threading.local()
+
+def report_progress(fraction=None, message=None):
+    # Updates the job running on this thread, if any; raises JobCancelled once it was cancelled
+    job = getattr(_current, "job", None)
+    if job is not None:
+        job.update(fraction, message)
+
+def _stage_started(name, fields):
+    # Each stage that opens a span shows up as the job's message, with a progress of its own
+    job = getattr(_current, "job", None)
+    if job is not None:
+        job.update(message=name)
+        job.progress = None
+
+add_listener(_stage_started)
+add_progress_listener(lambda fraction: report_progress(fraction))
+
+class Job:
+    def __init__(self, key, label):
+        self.key = key
+        self.label = label
+        self.status = "pending"
+        self.progress = None  # fraction done, when the job reports one
+        self.message = "Queued"
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.finished = None
+        self._cancelled = threading.Event()
+        self._stopped = threading.Event()  # set once no worker runs (or will run) this job
+        self._future = None
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed", "cancelled")
+
+    @property
+    def stopping(self):
+        # Cancelled, but its worker is still computing until its next checkpoint
+        return self._cancelled.is_set() and not self._stopped.is_set()
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.time()) - self.submitted
+
+    def update(self, fraction=None, message=None):
+        if self._cancelled.is_set():
+            raise JobCancelled(self.key)
+        if fraction is not None:
+            self.progress = fraction
+        if message is not None:
+            self.message = message
+
+    def _finish(self, status, message, result=None, error=None):
+        # The first outcome wins, so a job cancelled while finishing never reports a result
+        with self._lock:
+            if self.done:
+                return
+            self.status, self.message, self.result, self.error = status, message, result, error
+            self.finished = time.time()
+
+    def _start(self):
+        # Queued -> running, unless the job was cancelled while it waited
+        with self._lock:
+            if self.done:
+                return False
+            self.status, self.message = "running", "Running"
+            return True
+
+    def cancel(self):
+        # Reported as cancelled right away; the worker thread drops the result at its next checkpoint
+        self._cancelled.set()
+        self._finish("cancelled", "Cancelled")
+        if self._future is not None and self._future.cancel():
+            self._stopped.set()  # never started, so nothing is left running
+
+class JobRunner:
+    def __init__(self, max_workers=2, keep=32):
+        self.keep = keep
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args, label=None, **kwargs):
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.stopping:
+                count("jobs.refused")
+                raise JobStillStopping(f"{job.label} is still stopping after its cancellation")
+            if job is not None and job.status not in ("failed", "cancelled"):
+                self._jobs.move_to_end(key)
+                count("jobs.deduplicated")
+                return job
+            job = Job(key, label or key)
+            self._jobs[key] = job
+            self._evict()
+            job._future = self._executor.submit(self._run, job, fn, args, kwargs)
+        count("jobs.submitted")
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        _current.job = job
+        try:
+            if not job._start():
+                return
+            with span("job", label=job.label):
+                result = fn(*args, **kwargs)
+            job.progress = 1.0
+            job._finish("done", "Done", result=result)
+        except JobCancelled:
+            pass
+        except Exception as error:
+            job._finish("failed", str(error), error=error)
+        finally:
+            _current.job = None
+            job._stopped.set()
+
+    def _evict(self):
+        # Oldest finished jobs (and their results) go first; queued, running and still stopping jobs
+        # are never dropped
+        finished = [key for key, job in self._jobs.items() if job.done and not job.stopping]
+        for key in finished[:max(0, len(self._jobs) - self.keep)]:
+            del self._jobs[key]
+
+    def get(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def clear(self):
+        # Forgets finished jobs and their results (e.g. after their files were deleted)
+        with self._lock:
+            for key in [key for key, job in self._jobs.items() if job.done and not job.stopping]:
+                del self._jobs[key]
+
+    def cancel(self, key):
+        job = self.get(key)
+        if job is not None:
+            job.cancel()
+        return job
@@ -0,0 +1,65 @@
+# load_test.py
+# Fires single or batched lookups at a running serve.py and reports throughput and latency.
+# Usage: python load_test.py [--url http://127.0.0.1:8600] [--concurrency 8] [--requests 5000] [--batch-size 0]
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import quote, urlparse
+import numpy as np
+
+def fetch_items(connection, limit=1000):
+    connection.request("GET", f"/items?limit={limit}")
+    return json.loads(connection.getresponse().read())["items"]
+
+def run_worker(host, port, items, n_requests, batch_size, latencies, errors, seed):
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection(host, port)
+    for _ in range(n_requests):
+        kind = rng.choice(["bought-together", "similar"])
+        start = time.perf_counter()
+        if batch_size:
+            body = json.dumps({"kind": kind, "items": rng.sample(items, min(batch_size, len(items))), "n": 5})
+            connection.request("POST", "/batch", body=body, headers={"Content-Type": "application/json"})
+        else:
+            connection.request("GET", f"/{kind}?item={quote(rng.choice(items))}&n=5")
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        if response.status != 200:
+            errors.append(response.status)
+    connection.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test a local recommendation service.")
+    parser.add_argument("--url", default="http://127.0.0.1:8600")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=5000, help="Total requests across all workers")
+    parser.add_argument("--batch-size", type=int, default=0, help="Items per POST /batch; 0 sends single GETs")
+    args = parser.parse_args(argv)
+
+    url = urlparse(args.url)
+    items = fetch_items(http.client.HTTPConnection(url.hostname, url.port))
+    latencies, errors = [], []
+    per_worker = args.requests // args.concurrency
+    workers = [threading.Thread(target=run_worker, args=(url.hostname, url.port, items, per_worker,
+                                                         args.batch_size, latencies, errors, seed))
+               for seed in range(args.concurrency)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = 1000 * np.array(latencies)
+    print(f"requests: {len(latencies)}  errors: {len(errors)}  concurrency: {args.concurrency}  batch size: {args.batch_size}")
+    print(f"throughput: {len(latencies) / elapsed:.0f} req/s")
+    for p in (50, 90, 99, 99.9):
+        print(f"p{p}: {np.percentile(latencies_ms, p):.2f} ms")
+    print(f"max: {latencies_ms.max():.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import joblib
+import pandas as pd
+from instrumentation import count
+
+CACHE_DIR = "model_cache"
+
+def dataset_fingerprint(df):
+    # Content hash of the frame: values, column names and dtypes, independent of the row index
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    digest.update(json.dumps([[str(c), str(t)] for c, t in df.dtypes.items()]).encode())
+    return digest.hexdigest()
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass  # still mapped by a session on a platform that refuses to unlink open files
+
+class ModelCache:
+    # On-disk joblib cache for computed models with least-recently-used eviction by total size.
+    # Entries are opened with mmap_mode="r": the arrays inside (similarity matrices, embeddings,
+    # rule metrics) stay read-only views of the file, so every session and worker process shares
+    # one copy through the OS page cache instead of holding its own.
+    def __init__(self, directory=CACHE_DIR, max_bytes=2 * 1024 ** 3, mmap_mode="r"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.mmap_mode = mmap_mode
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        # Sessions and job threads share one cache: the counters and eviction run under this lock
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name, fingerprint, params):
+        key = json.dumps({"fingerprint": fingerprint, "params": params}, sort_keys=True, default=str)
+        return os.path.join(self.directory, f"{name}-{hashlib.sha256(key.encode()).hexdigest()[:32]}.joblib")
+
+    def get_or_compute(self, name, df, params, compute, fingerprint=None):
+        fingerprint = fingerprint or dataset_fingerprint(df)
+        path = self._path(name, fingerprint, params)
+
+        if os.path.exists(path):
+            try:
+                result = joblib.load(path, mmap_mode=self.mmap_mode)
+            except Exception:
+                # Unreadable entry (e.g. interrupted write by an older version): recompute it
+                _remove(path)
+            else:
+                os.utime(path)  # modification time doubles as the last-used time
+                self._count("hits")
+                return result
+
+        self._count("misses")
+        result = compute(df, **params)
+        # A unique temporary file per writer: two sessions computing the same entry each publish a
+        # complete file, never one torn by the other
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            joblib.dump(result, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            _remove(tmp_path)
+            raise
+        self._evict(keep=path)
+        if self.mmap_mode:
+            # Hand back the mapped copy too, so the computing session does not keep a private one
+            result = joblib.load(path, mmap_mode=self.mmap_mode)
+        return result
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+        count(f"model_cache.{name}")
+
+    def entries(self):
+        entries = []
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".joblib"):
+                path = os.path.join(self.directory, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # evicted by another process meanwhile
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def _evict(self, keep=None):
+        with self._lock:
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                _remove(path)
+                total -= size
+                self.stats["evictions"] += 1
+                count("model_cache.evictions")
+
+    def info(self):
+        entries = self.entries()
+        with self._lock:
+            stats = dict(self.stats)
+        return {**stats, "entries": len(entries), "bytes": sum(size for _, size, _ in entries)}
+
+    def clear(self):
+        with self._lock:
+            for _, _, path in self.entries():
+                _remove(path)
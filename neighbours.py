@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import normalize
+from sklearn.utils.extmath import safe_sparse_dot
+from instrumentation import progress, span
+
+def select_top_k(block, k, offset=0):
+    # block holds similarity rows for items offset..offset+len(block), or for the item positions
+    # given as an array in offset; it is modified in place
+    n_rows, n_items = block.shape
+    k = min(k, n_items - 1)
+    if n_rows == 0 or k <= 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=block.dtype)
+
+    # Never recommend an item to itself
+    rows = np.arange(n_rows)
+    positions = rows + offset if np.isscalar(offset) else np.asarray(offset)
+    block[rows, positions] = -np.inf
+
+    # Partial selection of the k best columns, then sort only those k
+    candidates = np.argpartition(-block, k - 1, axis=1)[:, :k]
+    candidate_scores = np.take_along_axis(block, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind="stable")
+    neighbours = np.take_along_axis(candidates, order, axis=1)
+    scores = np.take_along_axis(candidate_scores, order, axis=1)
+
+    items = np.repeat(positions, k)
+    return items, neighbours.ravel(), scores.ravel()
+
+def _collect(blocks):
+    parts = list(blocks)
+    if not parts:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0)
+    items, neighbours, scores = zip(*parts)
+    return np.concatenate(items), np.concatenate(neighbours), np.concatenate(scores)
+
+def top_k_neighbours(item_vectors, k=5, block_size=1024, cosine=True):
+    # Cosine top-k straight from item vectors, one block of rows at a time (O(block_size * N) scratch).
+    # cosine=False scores raw dot products, for embeddings whose dot products already are the scores.
+    vectors = normalize(item_vectors) if cosine else item_vectors
+    n_items = vectors.shape[0]
+
+    def blocks():
+        for start in range(0, n_items, block_size):
+            progress(start / n_items)
+            block = safe_sparse_dot(vectors[start:start + block_size], vectors.T, dense_output=True)
+            yield select_top_k(np.asarray(block, dtype=np.float64), k, offset=start)
+
+    with span("top_k", items=n_items, k=k, block_size=block_size, source="vectors"):
+        return _collect(blocks())
+
+def top_k_from_matrix(sim, k=5, block_size=1024):
+    # Same selection over an already computed similarity matrix (ndarray or np.memmap)
+    n_items = sim.shape[0]
+
+    def blocks():
+        for start in range(0, n_items, block_size):
+            progress(start / n_items)
+            block = np.array(sim[start:start + block_size], dtype=np.float64)
+            yield select_top_k(block, k, offset=start)
+
+    with span("top_k", items=n_items, k=k, block_size=block_size, source="matrix"):
+        return _collect(blocks())
+
+class NeighbourTable:
+    # Compact top-k similarity model: an item's neighbours and scores are one row of two arrays
+    def __init__(self, labels, neighbours, scores):
+        self.labels = pd.Index(labels)
+        width = np.size(neighbours) // len(self.labels) if len(self.labels) else 0
+        self.neighbours = np.asarray(neighbours, dtype=np.int32).reshape(len(self.labels), width)
+        self.scores = np.asarray(scores, dtype=np.float32).reshape(len(self.labels), width)
+        self._positions = {item: position for position, item in enumerate(self.labels)}
+
+    def lookup(self, item_name, top_n=5):
+        # Raw (neighbour positions, scores) for hot paths that do not need pandas objects
+        position = self._positions.get(item_name)
+        if position is None:
+            return None
+        return self.neighbours[position, :top_n], self.scores[position, :top_n]
+
+    def similar_items(self, item_name, top_n=5):
+        found = self.lookup(item_name, top_n)
+        if found is None:
+            return None
+        return pd.Series(found[1], index=self.labels[found[0]])
+
+    def save(self, path):
+        np.savez(path, labels=np.asarray(self.labels, dtype=str), neighbours=self.neighbours, scores=self.scores)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["labels"], data["neighbours"], data["scores"])
@@ -0,0 +1,58 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import pandas as pd
+from instrumentation import span
+from recommender import NoFrequentItemsets, generate_association_rules
+
+# Only these columns are shipped to the workers
+RULE_COLUMNS = ["InvoiceNo", "Description", "Quantity"]
+
+def partition_keys(df, by):
+    # by: a column name, "month" (of InvoiceDate), or a function returning one key per row.
+    # Rows whose key is missing (e.g. no valid InvoiceDate) belong to no partition.
+    if callable(by):
+        return pd.Series(by(df), index=df.index)
+    if by == "month":
+        months = pd.to_datetime(df["InvoiceDate"], errors="coerce").dt.to_period("M")
+        return months.astype(str).where(months.notna())
+    return df[by]
+
+def _mine_partition(key, part, params):
+    try:
+        rules = generate_association_rules(part, **params)
+    except NoFrequentItemsets:
+        rules = pd.DataFrame(columns=["antecedents", "consequents", "support", "confidence", "lift"])
+    return key, rules.assign(partition=key)
+
+def mine_partitioned_rules(df, by="Country", n_jobs=None, max_pending=None, max_tasks_per_child=None, **params):
+    # Mines each partition in a worker process. At most max_pending partitions are in flight;
+    # setting max_tasks_per_child also replaces workers after that many partitions (at the cost
+    # of starting fresh processes), so long runs cannot accumulate worker memory.
+    if params.get("algorithm", "apriori") not in ("apriori", "fpgrowth"):
+        raise ValueError(f"Unknown algorithm '{params['algorithm']}', expected 'apriori' or 'fpgrowth'.")
+    n_jobs = n_jobs or os.cpu_count()
+    max_pending = max_pending or 2 * n_jobs
+    keys = partition_keys(df, by)
+    columns = [col for col in RULE_COLUMNS if col in df.columns]
+    partitions = iter(df[columns].groupby(keys, observed=True, sort=True))
+
+    results = {}
+    # Rows without a key are left out of every partition; the span reports how many
+    with span("partitioned_mining", by=str(by), rows=len(df), unpartitioned_rows=int(keys.isna().sum())) as record:
+        with ProcessPoolExecutor(max_workers=n_jobs, max_tasks_per_child=max_tasks_per_child) as executor:
+            pending = set()
+            for key, part in partitions:
+                pending.add(executor.submit(_mine_partition, key, part, params))
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    results.update(future.result() for future in done)
+            results.update(future.result() for future in pending)
+        record["partitions"] = len(results)
+    return dict(sorted(results.items()))
+
+def merge_partition_rules(results):
+    # Global view: every partition's rules in one frame, tagged by the partition column
+    frames = [rules for rules in results.values() if not rules.empty]
+    if not frames:
+        return pd.DataFrame(columns=["antecedents", "consequents", "support", "confidence", "lift", "partition"])
+    return pd.concat(frames, ignore_index=True).sort_values(by="confidence", ascending=False)
@@ -0,0 +1,164 @@
+# pipeline.py
+# Headless batch run: load -> clean -> rules + similarity -> top-k tables -> optional per-customer
+# recommendations and PDF report.
+# Usage: python pipeline.py --config pipeline.json [--input data.csv] [--output-dir out] [--customers] [--report]
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataset_store import load_dataset, STAGE_COLUMNS
+from logger import log_action
+from neighbours import NeighbourTable, top_k_neighbours
+from recommender import build_item_user_matrix, generate_association_rules
+from rule_index import RuleIndex
+from customer_recommendations import recommend_for_customers
+
+DEFAULT_CONFIG = {
+    "input": None,
+    "output_dir": "pipeline_output",
+    "cleaning": [
+        "Drop missing CustomerID or Description",
+        "Remove canceled transactions (InvoiceNo starts with 'C')",
+        "Filter Quantity and UnitPrice > 0",
+        "Clean Description text"
+    ],
+    "rules": {"top_n_items": None, "min_support": 0.01, "max_len": None, "algorithm": "fpgrowth"},
+    "similarity": {"top_k": 10, "block_size": 1024},
+    "customers": None,
+    "report": None
+}
+
+# Used for the keys a "customers" config leaves out; model is "similarity" or "rules"
+CUSTOMER_DEFAULTS = {"model": "similarity", "top_k": 10, "chunk_size": 1024, "n_jobs": None}
+
+RULES_FILE = "rules.npz"
+SIMILARITY_FILE = "similar_items.npz"
+MANIFEST_FILE = "manifest.json"
+CUSTOMERS_FILE = "customer_recommendations.parquet"
+
+def load_config(path=None, **overrides):
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for key, value in json.load(f).items():
+                if isinstance(value, dict) and isinstance(config.get(key), dict):
+                    config[key].update(value)
+                else:
+                    config[key] = value
+    config.update({key: value for key, value in overrides.items() if value is not None})
+    if not config["input"]:
+        raise ValueError("No input dataset given (set 'input' in the config or pass --input).")
+    return config
+
+def build_rules(df, params):
+    rules = generate_association_rules(df, sparse=True, **params)
+    return rules, RuleIndex(rules)
+
+def build_neighbours(df, params):
+    item_user, items, _ = build_item_user_matrix(df)
+    _, neighbours, scores = top_k_neighbours(item_user, k=params["top_k"], block_size=params["block_size"])
+    return NeighbourTable(items, neighbours, scores)
+
+def write_report(df, rules, config):
+    # Plotting and fpdf are only imported when a report is requested
+    from report_generator import generate_pdf_report
+    from report_figures import report_figures, render_figures
+    from summary_cube import SummaryCube
+
+    directory = config["output_dir"]
+    summary = SummaryCube.from_frame(df)
+    paths = render_figures(report_figures(df, rules, summary=summary), directory=directory)
+    general_plots = {title: paths[name] for name, title in [
+        ("top_products", "Top Products"), ("top_countries", "Top Countries"), ("daily_orders", "Daily Orders")] if name in paths}
+    recommendation_plots = {}
+    evaluation_stats = {}
+    if not rules.empty:
+        recommendation_plots["Association Rule Plot"] = paths["association_plot"]
+        evaluation_stats = {
+            "total_rules": len(rules),
+            "high_confidence_rules": int((rules["confidence"] > 0.8).sum()),
+            "avg_lift": rules["lift"].mean()
+        }
+    return generate_pdf_report(df, rules=rules, cleaning_options=config["cleaning"], filename=config["report"],
+                               general_plots=general_plots, recommendation_plots=recommendation_plots,
+                               evaluation_stats=evaluation_stats, summary=summary, directory=directory)
+
+def run_pipeline(config):
+    timings = {}
+    start = time.perf_counter()
+    columns = None if config["report"] else STAGE_COLUMNS["recommender"]
+    df, ingest_report = load_dataset(config["input"], columns=columns, options=config["cleaning"])
+    timings["load"] = time.perf_counter() - start
+
+    # Rules and similarity only read the cleaned frame, so they run side by side
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        rules_future = executor.submit(build_rules, df, config["rules"])
+        neighbours_future = executor.submit(build_neighbours, df, config["similarity"])
+        rules, rule_index = rules_future.result()
+        neighbour_table = neighbours_future.result()
+    timings["models"] = time.perf_counter() - start
+
+    output_dir = config["output_dir"]
+    os.makedirs(output_dir, exist_ok=True)
+    rule_index.save(os.path.join(output_dir, RULES_FILE))
+    neighbour_table.save(os.path.join(output_dir, SIMILARITY_FILE))
+
+    customers = None
+    if config["customers"] is not None:
+        # Per-customer top-k lists for the whole customer base, scored with the models just built
+        start = time.perf_counter()
+        params = {**CUSTOMER_DEFAULTS, **config["customers"]}
+        model = rule_index if params.pop("model") == "rules" else neighbour_table
+        customers = recommend_for_customers(df, model, os.path.join(output_dir, CUSTOMERS_FILE), **params)
+        timings["customers"] = time.perf_counter() - start
+
+    report_path = None
+    if config["report"]:
+        start = time.perf_counter()
+        report_path = write_report(df, rules, config)
+        timings["report"] = time.perf_counter() - start
+
+    manifest = {
+        "config": config,
+        "rows": len(df),
+        "ingestion": ingest_report,
+        "rules": len(rule_index),
+        "items": len(neighbour_table.labels),
+        "customers": customers,
+        "report": report_path,
+        "timings": timings
+    }
+    with open(os.path.join(output_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, default=str)
+    log_action("Pipeline", "SUCCESS", f"{len(rule_index)} rules, {len(neighbour_table.labels)} items -> {output_dir}")
+    return manifest
+
+def load_pipeline_outputs(output_dir):
+    # What the UI or a service needs to answer lookups, without recomputing anything
+    with open(os.path.join(output_dir, MANIFEST_FILE), encoding="utf-8") as f:
+        manifest = json.load(f)
+    return {
+        "rules": RuleIndex.load(os.path.join(output_dir, RULES_FILE)),
+        "similarity": NeighbourTable.load(os.path.join(output_dir, SIMILARITY_FILE)),
+        "manifest": manifest
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute association rules and similar-item tables.")
+    parser.add_argument("--config", help="JSON config file; keys as in pipeline.DEFAULT_CONFIG")
+    parser.add_argument("--input", help="CSV dataset to process")
+    parser.add_argument("--output-dir", help="Where the rule and similarity tables are written")
+    parser.add_argument("--report", nargs="?", const="retail_report.pdf", help="Also write a PDF report (file name)")
+    parser.add_argument("--customers", nargs="?", const="similarity", choices=["similarity", "rules"],
+                        help="Also write top-k recommendations for every customer, scored with this model")
+    args = parser.parse_args(argv)
+
+    customers = {"model": args.customers} if args.customers else None
+    config = load_config(args.config, input=args.input, output_dir=args.output_dir, report=args.report, customers=customers)
+    manifest = run_pipeline(config)
+    print(json.dumps({key: manifest[key] for key in ("rows", "rules", "items", "customers", "report", "timings")}, indent=2))
+
+if __name__ == "__main__":
+    main()
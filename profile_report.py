@@ -0,0 +1,57 @@
+# profile_report.py
+# Aggregates the timing spans in logs/events.jsonl per stage: where the time and memory go.
+# Usage: python profile_report.py [--events logs/events.jsonl] [--since 2024-01-01T00:00] [--sort total]
+import argparse
+import json
+import pandas as pd
+from instrumentation import EVENTS_PATH
+
+def load_events(path=EVENTS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def summarize_spans(events, since=None):
+    spans = pd.DataFrame([e for e in events if e.get("type") == "span"])
+    if spans.empty:
+        return spans
+    if since:
+        spans = spans[spans["ts"] >= since]
+    for col in ("rows", "rows_in", "peak_rss_mb", "peak_rss_growth_mb"):
+        if col not in spans.columns:
+            spans[col] = None
+    # Cleaning steps record rows_in; everything else records rows
+    spans["rows"] = pd.to_numeric(spans["rows"], errors="coerce").fillna(pd.to_numeric(spans["rows_in"], errors="coerce"))
+    grouped = spans.groupby("name")
+    summary = pd.DataFrame({
+        "count": grouped.size(),
+        "errors": grouped["status"].apply(lambda s: int((s == "error").sum())),
+        "total_s": grouped["seconds"].sum(),
+        "mean_s": grouped["seconds"].mean(),
+        "p95_s": grouped["seconds"].quantile(0.95),
+        "max_s": grouped["seconds"].max(),
+        "max_rss_mb": grouped["peak_rss_mb"].max(),
+        "max_rss_growth_mb": grouped["peak_rss_growth_mb"].max(),
+        "rows": grouped["rows"].sum(min_count=1)
+    })
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize instrumentation spans per stage.")
+    parser.add_argument("--events", default=EVENTS_PATH)
+    parser.add_argument("--since", help="Only spans at or after this ISO timestamp")
+    parser.add_argument("--sort", default="total_s", choices=["total_s", "mean_s", "p95_s", "max_s", "count", "max_rss_mb"])
+    args = parser.parse_args(argv)
+
+    events = load_events(args.events)
+    summary = summarize_spans(events, args.since)
+    if summary.empty:
+        print(f"No spans in {args.events}")
+        return
+    with pd.option_context("display.width", 200, "display.max_rows", None, "display.max_columns", None, "display.float_format", "{:.3f}".format):
+        print(summary.sort_values(args.sort, ascending=False))
+    for event in events:
+        if event.get("type") == "counters":
+            print(f"\ncounters at {event['ts']}: {event['counters']}")
+
+if __name__ == "__main__":
+    main()
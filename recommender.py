@@ -1,51 +1,162 @@
 
+import numpy as np
 import pandas as pd
-from mlxtend.frequent_patterns import apriori, association_rules
+import scipy.sparse as sp
+from mlxtend.frequent_patterns import apriori, fpgrowth, association_rules
 from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+from sklearn.utils.extmath import safe_sparse_dot
+from neighbours import select_top_k, top_k_from_matrix, top_k_neighbours
+from ann_index import IVFIndex, LSHIndex
+from embeddings import ItemEmbeddings
+from rule_index import RuleIndex
+from instrumentation import progress, span
 
-def generate_association_rules(df, top_n_items=500):
-    # Limit to top N items to reduce memory usage
-    top_items = df['Description'].value_counts().nlargest(top_n_items).index
-    df_filtered = df[df['Description'].isin(top_items)]
+class NoFrequentItemsets(ValueError):
+    # Nothing reaches min_support; a ValueError, as mlxtend's own error for this case was
+    pass
 
-    # Create basket format
-    basket = df_filtered.groupby(['InvoiceNo', 'Description'])['Quantity'].sum().unstack().fillna(0)
-    basket_encoded = basket.applymap(lambda x: 1 if x > 0 else 0)
+def _encode(values):
+    # Integer codes with labels in sorted order, as groupby/pivot_table would order them
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.cat.remove_unused_categories()
+        values = values.cat.reorder_categories(values.cat.categories.sort_values())
+        return values.cat.codes.to_numpy(), values.cat.categories
+    return pd.factorize(values, sort=True)
 
-    # Run Apriori
-    frequent_itemsets = apriori(basket_encoded, min_support=0.01, use_colnames=True)
-    rules = association_rules(frequent_itemsets, metric="lift", min_threshold=1.0)
+def build_basket(df, top_n_items=None, sparse=True):
+    valid = df['InvoiceNo'].notna() & df['Description'].notna()
+    if top_n_items is not None:
+        # Limit to top N items to reduce memory usage
+        top_items = df.loc[valid, 'Description'].value_counts().nlargest(top_n_items).index
+        valid &= df['Description'].isin(top_items)
+
+    # Integer-code invoices and items; duplicate lines are summed on conversion like the old groupby
+    with span("build_basket", rows=int(valid.sum())) as record:
+        invoice_codes, invoices = _encode(df.loc[valid, 'InvoiceNo'])
+        item_codes, items = _encode(df.loc[valid, 'Description'])
+        quantity = df.loc[valid, 'Quantity'].fillna(0).to_numpy(dtype=np.float64)
+        summed = sp.csr_matrix((quantity, (invoice_codes, item_codes)), shape=(len(invoices), len(items)))
+        encoded = summed > 0
+        record.update(invoices=len(invoices), items=len(items))
+
+    invoices = pd.Index(invoices, name='InvoiceNo')
+    items = pd.Index(items, name='Description')
+    if sparse:
+        return pd.DataFrame.sparse.from_spmatrix(encoded, index=invoices, columns=items)
+    return pd.DataFrame(encoded.toarray(), index=invoices, columns=items)
+
+def generate_association_rules(df, top_n_items=500, min_support=0.01, max_len=None, algorithm="apriori", sparse=False):
+    # top_n_items=None mines the whole catalog; pair it with sparse=True and algorithm="fpgrowth"
+    basket_encoded = build_basket(df, top_n_items=top_n_items, sparse=sparse)
+
+    if algorithm not in ("apriori", "fpgrowth"):
+        raise ValueError(f"Unknown algorithm '{algorithm}', expected 'apriori' or 'fpgrowth'.")
+    miner = fpgrowth if algorithm == "fpgrowth" else apriori
+    with span(algorithm, rows=basket_encoded.shape[0], items=basket_encoded.shape[1]) as record:
+        frequent_itemsets = miner(basket_encoded, min_support=min_support, use_colnames=True, max_len=max_len)
+        record["itemsets"] = len(frequent_itemsets)
+    if frequent_itemsets.empty:
+        raise NoFrequentItemsets(f"No itemsets reach min_support={min_support}.")
+    with span("association_rules", itemsets=len(frequent_itemsets)) as record:
+        rules = association_rules(frequent_itemsets, metric="lift", min_threshold=1.0)
+        record["rules"] = len(rules)
     return rules.sort_values(by="confidence", ascending=False)
 
 def recommend_from_rules(rules, item_name, top_n=5):
+    if isinstance(rules, RuleIndex):
+        # Pre-sorted posting list: the top-n lookup is a slice
+        return rules.recommend(item_name, top_n)
     filtered = rules[rules['antecedents'].apply(lambda x: item_name in x)]
     recommendations = filtered.sort_values(by='confidence', ascending=False).head(top_n)
     return recommendations[['antecedents', 'consequents', 'confidence', 'lift','support']]
 
-def generate_similarity_matrix(df):
+def build_item_user_matrix(df):
+    # Integer-code items and customers so the matrix is built straight from the transaction columns
+    valid = df['CustomerID'].notna() & df['Description'].notna()
+    item_codes, items = _encode(df.loc[valid, 'Description'])
+    user_codes, users = _encode(df.loc[valid, 'CustomerID'])
+    quantity = df.loc[valid, 'Quantity'].fillna(0).to_numpy(dtype=np.float64)
+
+    # Duplicate (item, customer) pairs are summed on conversion, like pivot_table's aggfunc='sum'
+    item_user = sp.csr_matrix((quantity, (item_codes, user_codes)), shape=(len(items), len(users)))
+    return item_user, pd.Index(items, name='Description'), pd.Index(users, name='CustomerID')
+
+def blocked_cosine_similarity(item_user, block_size=1024):
+    # cosine_similarity(item_user) as float32, one block of rows at a time: no float64 N x N
+    # intermediate, and a progress checkpoint per block so a cancelled job stops between blocks
+    vectors = normalize(item_user)
+    n_items = vectors.shape[0]
+    similarity = np.empty((n_items, n_items), dtype=np.float32)
+    for start in range(0, n_items, block_size):
+        progress(start / n_items)
+        similarity[start:start + block_size] = safe_sparse_dot(vectors[start:start + block_size], vectors.T, dense_output=True)
+    return similarity
+
+def generate_similarity_matrix(df, sparse=False):
+    # float32 halves the N x N matrix; scores are shown to four decimals
+    if sparse:
+        # Memory for the item-user matrix scales with the number of purchases, not customers x items
+        item_user, items, _ = build_item_user_matrix(df)
+        with span("cosine_similarity", items=item_user.shape[0], users=item_user.shape[1], sparse=True):
+            similarity = blocked_cosine_similarity(item_user)
+        return pd.DataFrame(similarity, index=items, columns=items)
+
     user_item_matrix = df.pivot_table(index='CustomerID', columns='Description', values='Quantity', aggfunc='sum', fill_value=0)
     item_user_matrix = user_item_matrix.T
-    similarity = cosine_similarity(item_user_matrix)
+    with span("cosine_similarity", items=item_user_matrix.shape[0], users=item_user_matrix.shape[1], sparse=False):
+        similarity = cosine_similarity(item_user_matrix).astype(np.float32)
     sim_df = pd.DataFrame(similarity, index=item_user_matrix.index, columns=item_user_matrix.index)
     return sim_df
 
-def build_similarity_scores(sim_df, top_n=5):
-    all_scores = []
+def _similarity_table(items, neighbours, scores, labels):
+    return pd.DataFrame({
+        "Product": labels[items],
+        "Similar Item": labels[neighbours],
+        "Similarity": np.round(scores, 4)
+    })
+
+def build_similarity_scores(sim_df, top_n=5, block_size=1024):
+    if isinstance(sim_df, ItemEmbeddings):
+        # Dot products of the embedding, one block of rows at a time
+        items, neighbours, scores = top_k_neighbours(sim_df.vectors, k=top_n, block_size=block_size, cosine=False)
+        return _similarity_table(items, neighbours, scores, sim_df.labels)
+    # Top-k per item by blocked partial selection instead of a full sort of every column
+    items, neighbours, scores = top_k_from_matrix(sim_df.to_numpy(), k=top_n, block_size=block_size)
+    return _similarity_table(items, neighbours, scores, sim_df.columns)
 
-    for item in sim_df.columns:
-        similar_items = sim_df[item].drop(item, errors="ignore").sort_values(ascending=False).head(top_n)
-        for sim_item, score in similar_items.items():
-            all_scores.append({
-                "Product": item,
-                "Similar Item": sim_item,
-                "Similarity": round(score, 4)
-            })
+def generate_similarity_scores(df, top_n=5, block_size=1024):
+    # Same table as build_similarity_scores(generate_similarity_matrix(df)) without the N x N matrix
+    item_user, items, _ = build_item_user_matrix(df)
+    item_idx, neighbours, scores = top_k_neighbours(item_user, k=top_n, block_size=block_size)
+    return _similarity_table(item_idx, neighbours, scores, items)
 
-    return pd.DataFrame(all_scores)
+SIMILARITY_INDEXES = {"ivf": IVFIndex, "lsh": LSHIndex}
+
+def generate_similarity_index(df, method="ivf", **params):
+    # Approximate alternative to generate_similarity_matrix for very large catalogs; params go to
+    # the index (see ann_index.evaluate_lsh_settings to check recall@k against the exact path).
+    # On 4k items "ivf" (IVFIndex) answers in 0.7-0.8 ms at recall@10 0.90 and "lsh" (LSHIndex)
+    # needs 1.8 ms for 0.81, no faster than exact. Neither is sub-millisecond on 40k items.
+    item_user, items, _ = build_item_user_matrix(df)
+    return SIMILARITY_INDEXES[method](**params).fit(item_user, items)
+
+def generate_similarity_embeddings(df, n_factors=64):
+    # Compact alternative to generate_similarity_matrix: N x n_factors float32 instead of N x N float64
+    item_user, items, _ = build_item_user_matrix(df)
+    with span("svd_embeddings", items=item_user.shape[0], users=item_user.shape[1], n_factors=n_factors):
+        return ItemEmbeddings.fit(item_user, items, n_factors=n_factors)
 
 def recommend_similar_items(sim_df, item_name, top_n=5):
+    if not isinstance(sim_df, pd.DataFrame):
+        # Similarity models such as IVFIndex answer the lookup themselves
+        similar_items = sim_df.similar_items(item_name, top_n)
+        if similar_items is None:
+            return pd.DataFrame({'message': [f"Item '{item_name}' not found in similarity model."]})
+        return pd.DataFrame({'Item': similar_items.index, 'Similarity': similar_items.values})
     if item_name not in sim_df.columns or item_name not in sim_df.index:
         return pd.DataFrame({'message': [f"Item '{item_name}' not found in similarity matrix."]})
-    similar_items = sim_df[item_name].drop(item_name, errors='ignore').sort_values(ascending=False).head(top_n)
-    return pd.DataFrame({'Item': similar_items.index, 'Similarity': similar_items.values})
-
+    position = sim_df.columns.get_loc(item_name)
+    row = sim_df.iloc[:, position].to_numpy(dtype=np.float64, copy=True)[np.newaxis, :]
+    _, neighbours, scores = select_top_k(row, top_n, offset=position)
+    return pd.DataFrame({'Item': sim_df.columns[neighbours], 'Similarity': scores})
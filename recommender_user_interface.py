@@ -1,23 +1,174 @@
 from streamlit.runtime.scriptrunner import add_script_run_ctx
 import os
 import numpy as np
-from difflib import get_close_matches
 import streamlit as st
-import shutil
 import io
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
-from data_processing import clean_data
-from visualizations import plot_top_products, plot_top_countries, plot_daily_orders,plot_similarity_heatmap, plot_association_rules
-from recommender import generate_association_rules,recommend_from_rules,generate_similarity_matrix,build_similarity_scores,recommend_similar_items
-from report_generator import generate_pdf_report, save_plot
+from data_processing import build_cleaning_plan, cleaning_mask, apply_cleaning_plan, CLEANING_OPTIONS
+from summary_cube import SummaryCube
+from visualizations import top_rules, heatmap_subset, similarity_histogram
+from recommender import generate_association_rules,recommend_from_rules,generate_similarity_matrix,generate_similarity_embeddings,recommend_similar_items
+from rule_index import RuleIndex
+from evaluation import evaluate_models
+from catalog_search import CatalogIndex
+from report_generator import generate_pdf_report
+from report_figures import render_figures
 from logger import log_action
+from model_cache import ModelCache
+from dataset_store import load_dataset
+from job_runner import JobRunner, JobStillStopping, report_progress
 
 import warnings
 warnings.filterwarnings("ignore")
 
 st.set_page_config(page_title="Retail Data Explorer & Recommender", layout="wide")
+
+@st.cache_resource
+def get_model_cache():
+    # One cache (and one set of hit/miss counters) shared by all sessions of this server
+    return ModelCache()
+
+model_cache = get_model_cache()
+
+@st.cache_resource
+def get_job_runner():
+    # Shared by all sessions too: identical requests run once and finished results outlive reruns
+    return JobRunner()
+
+jobs = get_job_runner()
+
+# Streamlit reruns this script on every interaction; everything below is keyed by the dataset
+# identity plus the cleaning applied, so unchanged aggregates, figures and PNGs are reused.
+@st.cache_data(show_spinner=False, max_entries=4, ttl=600)
+def load_csv(source_key, _source):
+    # The ttl makes a URL be checked for a newer version again; unchanged files come from dataset_cache/
+    return load_dataset(_source)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def summarize(data_key, _df):
+    # One aggregation pass feeds the exploration panel, the charts and the report
+    return SummaryCube.from_frame(_df)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def cleaned_summary(data_key, _summary, _df, _plan, _keep):
+    # Updated from the dropped rows and the distinct values, not by rescanning the cleaned frame
+    return _summary.after_cleaning(_df, _plan, _keep)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def explore_data(data_key, _df, _summary):
+    buffer = io.StringIO()
+    _df.info(buf=buffer)
+    return buffer.getvalue(), _summary.missing(), _summary.describe()
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def catalog_index(key, _labels):
+    # Built once per dataset (or similarity model) and shared by every session
+    return CatalogIndex(_labels)
+
+def product_picker(label, catalog, popular, key):
+    # Typeahead: the selectbox only ever holds the current matches, never the whole catalog
+    query = st.text_input("Search products", key=f"{key}_query", placeholder="Type part of a product name...")
+    options = catalog.search_labels(query, limit=50) if query else [item for item in popular if item in catalog.labels]
+    return st.selectbox(label, options, index=None, placeholder="Choose product...", key=key)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def figure_data(data_key, name, _compute):
+    return _compute()
+
+# Figures shown in this run, {name: (draw function, data)}; the report reuses their PNGs
+figure_specs = {}
+
+def show_figures(specs):
+    # specs: {name: (data_key, draw function, compute)}. PNGs are named by a hash of the data they
+    # draw, so the display and the PDF share one render and unchanged figures are never redrawn.
+    for name, (data_key, draw, compute) in specs.items():
+        figure_specs[name] = (draw, figure_data(data_key, name, compute))
+    paths = render_figures({name: figure_specs[name] for name in specs})
+    return [paths[name] for name in specs]
+
+# Long computations run as background jobs: a button only submits one and remembers its key in a
+# session slot, so widget changes while it runs no longer restart (and lose) the work. Keys are the
+# dataset's content fingerprint plus the model parameters, so identical work is shared across sessions.
+def start_job(slot, key, label, fn, *args, **kwargs):
+    try:
+        st.session_state[slot] = jobs.submit(key, fn, *args, label=label, **kwargs).key
+    except JobStillStopping as error:
+        st.warning(f"{error}; try again in a moment.")
+
+@st.fragment(run_every=1.0)
+def job_progress(slot):
+    # Polls only this panel; the whole app reruns once the job has finished
+    job = jobs.get(st.session_state.get(slot))
+    if job is None or job.done:
+        st.rerun()
+    text = f"⏳ {job.label}: {job.message} ({job.elapsed:.0f}s)"
+    if job.progress is not None:
+        st.progress(job.progress, text=text)
+    else:
+        st.info(text)
+    if st.button("Cancel", key=f"cancel_{slot}"):
+        job.cancel()
+        st.rerun()
+
+def finished_job(slot):
+    # The job in this slot once it has succeeded (the slot is then cleared); shows progress meanwhile
+    job = jobs.get(st.session_state.get(slot))
+    if job is None:
+        st.session_state.pop(slot, None)
+        return None
+    if not job.done:
+        job_progress(slot)
+        return None
+    del st.session_state[slot]
+    if job.status == "failed":
+        st.error(f"{job.label} failed: {job.error}")
+        log_action(job.label, "FAILED", str(job.error))
+    elif job.status == "cancelled":
+        st.warning(f"{job.label} cancelled.")
+        log_action(job.label, "CANCELLED", job.key)
+    return job if job.status == "done" else None
+
+RULE_PARAMS = {"algorithm": "fpgrowth", "sparse": True}
+SIMILARITY_MODELS = {
+    "Exact matrix": ("similarity", {"sparse": True}, generate_similarity_matrix),
+    "Latent factors": ("embeddings", {"n_factors": 64}, generate_similarity_embeddings),
+}
+# Rules at the app's settings (top 500 items) and the top-50 neighbour table
+HOLDOUT_PARAMS = {"k": 10, "rule_grid": [{"top_n_items": 500}]}
+
+def mine_rules(df):
+    rules = model_cache.get_or_compute("rules", df, RULE_PARAMS, generate_association_rules)
+    return rules, RuleIndex(rules)
+
+def build_report(df, specs, rules, sim_df, evaluation_stats, cleaning_applied, report_name, summary):
+    # --- Figures: the ones shown in the app are already rendered; missing ones are drawn in parallel ---
+    report_progress(0.1, "Rendering figures")
+    paths = render_figures(specs)
+    general_plots = {title: paths[name] for name, title in [
+        ("top_products", "Top Products"), ("top_countries", "Top Countries"), ("daily_orders", "Daily Orders")] if name in paths}
+    recommendation_plots = {title: paths[name] for name, title in [
+        ("association_confidence", "Association Rule Plot"), ("similarity_heatmap", "Similarity Heatmap")] if name in paths}
+
+    # --- Evaluation: Similarity Matrix ---
+    if "similarity_hist" in paths:
+        evaluation_stats["similarity_hist_path"] = paths["similarity_hist"]
+        evaluation_stats["similarity_top_scores"] = specs["similarity_hist"][1][2][::-1].tolist()  # highest first
+        evaluation_stats["similarity_quantiles"] = specs["similarity_hist"][1][3]
+
+    report_progress(0.6, "Writing PDF")
+    return generate_pdf_report(
+        df,
+        rules=rules,
+        sim_df=sim_df,
+        cleaning_options=cleaning_applied,
+        filename=report_name,
+        general_plots=general_plots,
+        recommendation_plots=recommendation_plots,
+        evaluation_stats=evaluation_stats,  # ⬅️ pass evaluation into the PDF generator
+        summary=summary
+    )
 st.title("🛍️ Retail Store Data Explorer & Recommender System")
 st.markdown("👨‍💻 By: Unisha Joshi")
 
@@ -40,6 +191,7 @@ with st.sidebar.expander("❓ Help & Instructions", expanded=False):
     ### 🤖 Recommendations
     - Generate **association rules** to suggest frequently bought-together items.
     - Use **collaborative filtering** to find similar items based on purchase patterns.
+    - Rules, similarity models, evaluation and reports run in the background: keep using the app while they run, or **Cancel** them.
 
     ### 📈 Visualizations
     - Automatically shows top products, countries, and daily order trends.
@@ -58,12 +210,17 @@ with st.sidebar.expander("❓ Help & Instructions", expanded=False):
     """)
 with st.sidebar.expander("🔐 Security Notice"):
     st.markdown("""
-    - Uploaded files are **not stored** permanently.
+    - Uploaded files are **not stored** permanently; a columnar copy is kept in `dataset_cache/` for fast reloads until the session is reset.
     - All data is processed locally during your session.
     - Please avoid uploading personally identifiable or sensitive data.
     - The app is intended for **educational and analytical purposes** only.
     - All generated reports are saved locally in your browser or system.
+    - Generated rules and similarity matrices are cached locally in `model_cache/` and memory-mapped read-only, so sessions on the same dataset share one copy, until the session is reset.
     """)
+with st.sidebar.expander("🗄️ Model Cache"):
+    cache_info = model_cache.info()
+    st.write(f"Hits: {cache_info['hits']} | Misses: {cache_info['misses']} | Evictions: {cache_info['evictions']}")
+    st.write(f"Entries: {cache_info['entries']} ({cache_info['bytes'] / 1024 ** 2:.1f} MB)")
 
 st.sidebar.header("📥 Load Dataset")
 upload = st.sidebar.file_uploader("Upload CSV", type=["csv"])
@@ -71,15 +228,15 @@ url_input = st.sidebar.text_input("Or load from URL")
 
 query_params = st.query_params
 if "reset" in query_params:
-    # Clear session state
+    # Only this session is reset: its state (including its job slots and keys) and the PDF it wrote.
+    # Cached models, datasets, figures and jobs are shared by every session and stay within their
+    # own LRU, size and entry bounds.
+    report = st.session_state.get("report")
+    if report and os.path.exists(report[0]):
+        os.remove(report[0])
     for key in list(st.session_state.keys()):
         del st.session_state[key]
 
-    # Delete all generated files
-    if os.path.exists("reports"):
-        shutil.rmtree("reports")
-        os.makedirs("reports")
-
     # Redirect back to clean app state (remove the ?reset param)
     st.query_params.clear()  # clears all params
     st.success("Session fully reset.")
@@ -102,20 +259,26 @@ if "reset" in query_params:
     st.stop()  # stop rerun from processing further
 
 df = None
+data_key = None
 if upload:
-    df = pd.read_csv(upload)
+    df, ingest_report = load_csv(f"upload:{upload.file_id}", upload)
+    data_key = f"data:{ingest_report['fingerprint']}"
     st.success("Loaded from file.")
     log_action("Data Load", "SUCCESS", "Loaded from uploaded file.")
 elif url_input:
     try:
-        df = pd.read_csv(url_input)
+        df, ingest_report = load_csv(f"url:{url_input}", url_input)
+        data_key = f"data:{ingest_report['fingerprint']}"
         st.success("Loaded from URL.")
         log_action("Data Load", "SUCCESS", "Loaded from URL.")
     except:
         st.error("Failed to load data from URL.")
-        log_action("Data Load", "SUCCESS", "Loaded from URL.")
+        log_action("Data Load", "FAILED", f"Could not load {url_input}")
 
 if df is not None:
+    st.caption(f"{ingest_report['rows_kept']:,} rows in {ingest_report['bytes'] / 1024 ** 2:.1f} MB "
+               f"({ingest_report['saved_bytes'] / 1024 ** 2:.1f} MB saved by compact column types).")
+
     # Data Preview section
     st.subheader("🔍 Data Preview")
     st.dataframe(df.head())
@@ -123,49 +286,59 @@ if df is not None:
 
     # Data Exploration Section
     st.subheader("📊 Data Exploration")
+    summary = summarize(data_key, df)
+    info_text, missing_values, summary_stats = explore_data(data_key, df, summary)
     with st.expander("Show Info"):
-        buffer = io.StringIO()
-        df.info(buf=buffer)
-        s = buffer.getvalue()
-        st.text(s)
+        st.text(info_text)
         log_action("Data Exploration", "SHOWN", "Displayed info summary.")
     with st.expander("Missing Values"):
-        st.write(df.isnull().sum())
+        st.write(missing_values)
         log_action("Data Exploration", "SHOWN", "Displayed missing values.")
     with st.expander("Summary Stats"):
-        st.write(df.describe(include='all'))
+        st.write(summary_stats)
         log_action("Data Exploration", "SHOWN", "Displayed descriptive statistics.")    
 
     # Data Visualization section
     st.subheader("📈 Visualizations")
+    general_specs = {}
+    if "Description" in df.columns:
+        general_specs["top_products"] = (data_key, "draw_top_products", lambda: summary.top("Description"))
+    if "Country" in df.columns:
+        general_specs["top_countries"] = (data_key, "draw_top_countries", lambda: summary.top("Country"))
+    if summary.invoice_days is not None:
+        general_specs["daily_orders"] = (data_key, "draw_daily_orders", lambda: summary.daily_orders())
+    # The three charts are independent, so any that are missing are drawn side by side
+    general_paths = dict(zip(general_specs, show_figures(general_specs)))
+
     col1, col2 = st.columns(2)
     with col1:
-        if "Description" in df.columns:
-            st.pyplot(plot_top_products(df))
+        if "top_products" in general_paths:
+            st.image(general_paths["top_products"])
             log_action("Visualization", "SUCCESS", "Top products plot rendered.")
     with col2:
-        if "Country" in df.columns:
-            st.pyplot(plot_top_countries(df))
+        if "top_countries" in general_paths:
+            st.image(general_paths["top_countries"])
             log_action("Visualization", "SUCCESS", "Top countries plot rendered.")
 
-    if "InvoiceDate" in df.columns:
-        st.pyplot(plot_daily_orders(df))
+    if "daily_orders" in general_paths:
+        st.image(general_paths["daily_orders"])
         log_action("Visualization", "SUCCESS", "Daily orders plot rendered.")
 
     # Data Cleaning Section
     st.subheader("🧼 Data Cleaning Options")    
-    options = st.multiselect("Select cleaning options", [
-        "Drop missing CustomerID or Description",
-        "Remove canceled transactions (InvoiceNo starts with 'C')",
-        "Filter Quantity and UnitPrice > 0",
-        "Clean Description text",
-        "Convert InvoiceDate to datetime",
-        "Convert CustomerID to string"
-    ])
+    options = st.multiselect("Select cleaning options", CLEANING_OPTIONS)
     if st.button("Apply Cleaning"):
-        df = clean_data(df, options)
+        cleaning_report = {}
+        plan = build_cleaning_plan(options)
+        keep = cleaning_mask(df, plan, cleaning_report)
+        cleaned_key = f"{data_key}|cleaned:{options}"
+        summary = cleaned_summary(cleaned_key, summary, df, plan, keep)
+        df = apply_cleaning_plan(df, plan, cleaning_report, keep)
+        data_key = cleaned_key
         st.success("Cleaning applied.")
         st.write(df.head())
+        if cleaning_report:
+            st.dataframe(pd.DataFrame(cleaning_report).T.rename_axis("Step"))
         log_action("Data Cleaning", "SUCCESS", f"Options: {options}")
         
 
@@ -173,23 +346,30 @@ if df is not None:
     st.subheader("🤖 Generate Recommendations")
 
     if st.button("Generate Association Rules"):
-        rules = generate_association_rules(df)
+        start_job("rules_job", f"{data_key}|rules:{RULE_PARAMS}", "Association rules", mine_rules, df)
+    job = finished_job("rules_job")
+    if job is not None:
+        rules, st.session_state.rule_index = job.result
         st.session_state.rules = rules
+        st.session_state.rules_key = job.key
         st.success("Association rules generated.")
         log_action("Association Rules", "SUCCESS", f"{len(rules)} rules generated.")
     # Association Rule Plot
     if "rules" in st.session_state:
         st.subheader("📊 Association Rule Metrics")
         metric = st.selectbox("Select metric to plot", ["confidence", "support", "lift"])
-        st.pyplot(plot_association_rules(st.session_state.rules, metric))
+        rules_df = st.session_state.rules
+        st.image(show_figures({f"association_{metric}": (st.session_state.rules_key, "draw_association_rules", lambda: top_rules(rules_df, metric))})[0])
     if "rules" in st.session_state and "Description" in df.columns:
         st.subheader("🧩 Item-wise Association Rule Recommendations")
     
-        product_list = sorted(df['Description'].dropna().unique())
-        selected_item = st.selectbox("Select a product to get association-based recommendations", product_list, index=None, placeholder="Choose product...")
+        # Sorted distinct descriptions, so catalog ids match the recommender's item ids for this data
+        catalog = catalog_index(data_key, summary.values["Description"].index.sort_values())
+        popular = list(summary.top("Description", 50).index)
+        selected_item = product_picker("Select a product to get association-based recommendations", catalog, popular, "rules_item")
     
         if selected_item:
-            recs = recommend_from_rules(st.session_state.rules, selected_item)
+            recs = recommend_from_rules(st.session_state.rule_index, selected_item)
             if not recs.empty:
                 st.write(f"💡 Recommended with **{selected_item}**:")
                 st.dataframe(recs)
@@ -215,26 +395,29 @@ if df is not None:
     # --- SIMILARITY MATRIX SECTION ---
     st.subheader("📊 Item Similarity (Collaborative Filtering)")
     
+    # Exact N x N matrix, or a compact latent-factor embedding for large catalogs
+    similarity_mode = st.radio("Similarity model", ["Exact matrix", "Latent factors"], horizontal=True)
+
     # Button to generate similarity matrix
     if st.button("Generate Similarity Matrix"):
-        sim_df = generate_similarity_matrix(df)
+        name, params, compute = SIMILARITY_MODELS[similarity_mode]
+        start_job("sim_job", f"{data_key}|{name}:{params}", f"Similarity ({similarity_mode})",
+                  model_cache.get_or_compute, name, df, params, compute)
+    job = finished_job("sim_job")
+    if job is not None:
+        sim_df = job.result
+        shape = sim_df.vectors.shape if hasattr(sim_df, "vectors") else sim_df.shape
         st.session_state.sim_df = sim_df
+        st.session_state.sim_key = job.key
         st.success("Similarity matrix generated.")
-        log_action("Similarity Matrix", "SUCCESS", f"Shape: {sim_df.shape}")
+        log_action("Similarity Matrix", "SUCCESS", f"{job.label} shape: {shape}")
     
     # Show heatmap if matrix is generated
     if "sim_df" in st.session_state and st.session_state.sim_df is not None:
         st.subheader("🔥 Item Similarity Heatmap")
-        fig5 = plot_similarity_heatmap(st.session_state.sim_df)
-    
-        if fig5:
-            st.pyplot(fig5)
-    
-            # Save plot for report (if you're using recommendation_plots)
-            if "recommendation_plots" not in st.session_state:
-                st.session_state.recommendation_plots = {}
-    
-            st.session_state.recommendation_plots["Similarity Heatmap"] = save_plot(fig5, "similarity_heatmap.png")
+        sim_df = st.session_state.sim_df
+        if hasattr(sim_df, "iloc") or hasattr(sim_df, "submatrix"):
+            st.image(show_figures({"similarity_heatmap": (st.session_state.sim_key, "draw_similarity_heatmap", lambda: heatmap_subset(sim_df))})[0])
         else:
             st.warning("Could not generate heatmap from the similarity matrix.")
 
@@ -242,135 +425,89 @@ if df is not None:
     if "sim_df" in st.session_state and st.session_state.sim_df is not None:
         st.subheader("🧭 Item-wise Similarity Recommendations")
     
-        similarity_item = st.selectbox("Select a product for similarity-based recommendations", list(st.session_state.sim_df.columns), index=None, placeholder="Choose product...")
+        # Catalog ids are the similarity model's item positions
+        sim_df = st.session_state.sim_df
+        catalog = catalog_index(st.session_state.sim_key, sim_df.columns if hasattr(sim_df, "columns") else sim_df.labels)
+        popular = list(summary.top("Description", 50).index) if "Description" in summary.values else []
+        similarity_item = product_picker("Select a product for similarity-based recommendations", catalog, popular, "similarity_item")
     
         if similarity_item:
-            similar_items = (
-                st.session_state.sim_df[similarity_item]
-                .drop(similarity_item, errors="ignore")
-                .sort_values(ascending=False)
-                .head(5)
-            )
+            similar_items = recommend_similar_items(st.session_state.sim_df, similarity_item, top_n=5)
             st.write(f"🔍 Top similar items to **{similarity_item}**:")
-            st.dataframe(pd.DataFrame({
-                "Similar Item": similar_items.index,
-                "Similarity Score": similar_items.values
-            }))
+            st.dataframe(similar_items.rename(columns={"Item": "Similar Item", "Similarity": "Similarity Score"}))
     # --- Evaluate Similarity Matrix ---
     if "sim_df" in st.session_state and st.session_state.sim_df is not None:
         st.markdown("### 🔍 Similarity Matrix Evaluation")
     
-        # Flatten matrix to get score distribution
-        sim_vals = st.session_state.sim_df.values.flatten()
-        sim_vals = sim_vals[sim_vals != 1]  # exclude diagonal/self similarity  
+        # A ScoreSketch reads the upper triangle in row blocks: each item pair once, no self similarity
+        sim_df = st.session_state.sim_df
         st.write("**Histogram of Similarity Scores**")
-        fig, ax = plt.subplots()
-        ax.hist(sim_vals, bins=30, color='skyblue', edgecolor='black')
-        ax.set_title("Distribution of Similarity Scores")
-        ax.set_xlabel("Similarity Score")
-        ax.set_ylabel("Frequency")
-        st.pyplot(fig)
+        st.image(show_figures({"similarity_hist": (st.session_state.sim_key, "draw_similarity_histogram", lambda: similarity_histogram(sim_df))})[0])
+        quantiles = figure_specs["similarity_hist"][1][3]
+        st.caption("Item pairs: " + ", ".join(f"p{q * 100:g} {value:.3f}" for q, value in quantiles.items()))
+
+    # --- Held-out Evaluation: train before a date cutoff, score the later purchases ---
+    st.markdown("### 📏 Held-out Evaluation")
+    if "InvoiceDate" in df.columns and st.button("Evaluate on held-out purchases"):
+        start_job("holdout_job", f"{data_key}|evaluation:{HOLDOUT_PARAMS}", "Held-out evaluation", model_cache.get_or_compute,
+                  "evaluation", df, HOLDOUT_PARAMS, evaluate_models)
+    job = finished_job("holdout_job")
+    if job is not None:
+        holdout = job.result
+        st.session_state.holdout = holdout
+        st.session_state.holdout_key = job.key
+        log_action("Held-out Evaluation", "SUCCESS", f"Cutoff {holdout.attrs['cutoff']}, {holdout['customers'].iloc[0]} customers")
+    if st.session_state.get("holdout") is not None:
+        holdout = st.session_state.holdout
+        st.caption(f"Trained on purchases before {holdout.attrs['cutoff']}; top {holdout.attrs['k']} items scored against each customer's first purchases after it.")
+        st.dataframe(holdout.astype({"settings": str}))
 
 
-    # Prepare plots
-    general_plots = {}
-    recommendation_plots = {}
-    
-    if "Description" in df.columns:
-        fig1 = plot_top_products(df)
-        general_plots["Top Products"] = save_plot(fig1, "top_products.png")
-    
-    if "Country" in df.columns:
-        fig2 = plot_top_countries(df)
-        general_plots["Top Countries"] = save_plot(fig2, "top_countries.png")
-    
-    if "InvoiceDate" in df.columns:
-        fig3 = plot_daily_orders(df)
-        general_plots["Daily Orders"] = save_plot(fig3, "daily_orders.png")
-    
-    if "rules" in st.session_state:
-        fig4 = plot_association_rules(st.session_state.rules, "confidence")
-        recommendation_plots["Association Rule Plot"] = save_plot(fig4, "association_plot.png")
-    
-    if "sim_df" in st.session_state:
-        fig5 = plot_similarity_heatmap(st.session_state.sim_df)
-        if fig5:
-            recommendation_plots["Similarity Heatmap"] = save_plot(fig5, "similarity_heatmap.png")
-               
     # ------------------- REPORT SECTION -------------------
     st.subheader("📝 Export Report")
     report_name = st.text_input("Report filename", value="retail_report.pdf")
     
     if st.button("Generate PDF Report"):
-        if df is not None:
-            cleaning_applied = options if 'options' in locals() else []
-            rules = st.session_state.get("rules")
-            sim_df = st.session_state.get("sim_df")
-    
-            # --- Evaluation: Association Rules ---
-            evaluation_stats = {}
-            if rules is not None and not rules.empty:
-                high_conf = rules[rules["confidence"] > 0.8]
-                avg_lift = rules["lift"].mean()
-                evaluation_stats["total_rules"] = len(rules)
-                evaluation_stats["high_confidence_rules"] = len(high_conf)
-                evaluation_stats["avg_lift"] = avg_lift
-    
-            # --- Evaluation: Similarity Matrix ---
-            hist_path = None
-            if sim_df is not None:
-                import numpy as np
-                sim_vals = sim_df.values.flatten()
-                sim_vals = sim_vals[sim_vals < 0.999]
-                top_scores = np.sort(sim_vals)[-50:]
-    
-                # Save histogram
-                fig, ax = plt.subplots()
-                ax.hist(sim_vals, bins=30, color='skyblue', edgecolor='black')
-                ax.set_title("Distribution of Similarity Scores")
-                ax.set_xlabel("Similarity Score")
-                ax.set_ylabel("Frequency")
-                plt.tight_layout()
-                hist_path = "reports/similarity_score_hist.png"
-                fig.savefig(hist_path)
-                plt.close()
-    
-                evaluation_stats["similarity_hist_path"] = hist_path
-                evaluation_stats["similarity_top_scores"] = top_scores.tolist()
-    
-            # --- Generate Report ---
-            report_path = generate_pdf_report(
-                df,
-                rules=rules,
-                sim_df=sim_df,
-                cleaning_options=cleaning_applied,
-                filename=report_name,
-                general_plots=general_plots,
-                recommendation_plots=recommendation_plots,
-                evaluation_stats=evaluation_stats  # ⬅️ pass evaluation into the PDF generator
-            )
-
+        cleaning_applied = options if 'options' in locals() else []
+        rules = st.session_state.get("rules")
+        sim_df = st.session_state.get("sim_df")
+
+        # --- Evaluation: Association Rules ---
+        evaluation_stats = {}
+        if rules is not None and not rules.empty:
+            high_conf = rules[rules["confidence"] > 0.8]
+            avg_lift = rules["lift"].mean()
+            evaluation_stats["total_rules"] = len(rules)
+            evaluation_stats["high_confidence_rules"] = len(high_conf)
+            evaluation_stats["avg_lift"] = avg_lift
+        if st.session_state.get("holdout") is not None:
+            evaluation_stats["holdout"] = st.session_state.holdout
+
+        # Figure data comes from the app's caches; drawing and the PDF itself run in the background
+        if rules is not None and not rules.empty:
+            figure_specs["association_confidence"] = ("draw_association_rules", figure_data(st.session_state.rules_key, "association_confidence", lambda: top_rules(rules, "confidence")))
+        if sim_df is not None and (hasattr(sim_df, "iloc") or hasattr(sim_df, "submatrix")):
+            figure_specs["similarity_heatmap"] = ("draw_similarity_heatmap", figure_data(st.session_state.sim_key, "similarity_heatmap", lambda: heatmap_subset(sim_df)))
+            figure_specs["similarity_hist"] = ("draw_similarity_histogram", figure_data(st.session_state.sim_key, "similarity_hist", lambda: similarity_histogram(sim_df)))
+        inputs = [st.session_state.get(name) for name in ("rules_key", "sim_key", "holdout_key")]
+        start_job("report_job", f"{data_key}|report:{report_name}|{inputs}", "PDF report", build_report, df, dict(figure_specs),
+                  rules, sim_df, evaluation_stats, cleaning_applied, report_name, summary)
+    job = finished_job("report_job")
+    if job is not None:
+        st.session_state.report = (job.result, os.path.basename(job.result))
+        log_action("Report Export", "SUCCESS", f"Report saved as {st.session_state.report[1]}")
+    if st.session_state.get("report") and os.path.exists(st.session_state.report[0]):
+        report_path, report_file = st.session_state.report
         with open(report_path, "rb") as f:
-            st.download_button("📥 Download Report", f, file_name=report_name)
-        log_action("Report Export", "SUCCESS", f"Report saved as {report_name}")
-    else:
-        st.warning("Please load and clean a dataset first.")
-        log_action("Report Export", "Fail", f"Failed to save report as {report_name}")
+            st.download_button("📥 Download Report", f, file_name=report_file)
 
     # Addressing Security
     st.markdown("---")
      
     if st.button("🔄 Reset Session"):
-        # Clear Streamlit session state
-        
-       for key in list(st.session_state.keys()):
-           del st.session_state[key]
-           if os.path.exists("reports"):
-               shutil.rmtree("reports")
-               os.makedirs("reports", exist_ok=True)
-               st.success("Session has been reset and all generated files were deleted.")
-               st.query_params.update({"reset": "true"})
-               st.rerun()
+        # The ?reset handler at the top of the script clears this session
+        st.query_params.update({"reset": "true"})
+        st.rerun()
 
     st.info("🔒 **Reminder:** Use the Reset Session button to clear memory and files before exiting.")
 
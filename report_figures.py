@@ -0,0 +1,98 @@
+# report_figures.py
+# Builds the report's PNGs. Every figure is reduced to the small table it draws, named by a hash of
+# that table, and only drawn when no PNG with that name exists yet. Missing figures are drawn in
+# parallel worker processes on the headless Agg backend.
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import joblib
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from PIL import Image
+from instrumentation import span
+from summary_cube import SummaryCube
+import visualizations as viz
+
+FIGURE_DIR = "reports"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _figure_pool(max_workers=None):
+    # One pool per process, started with spawn: the app calls this from job and script threads, and
+    # forking a multithreaded process can copy a lock some other thread holds into the child. The
+    # workers (and their matplotlib import) are started once and reused by every later call.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def _drop_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+
+def report_figures(df, rules=None, sim_df=None, summary=None):
+    # {name: (draw function name in visualizations, data)} for every figure the report can hold
+    summary = summary or SummaryCube.from_frame(df)
+    figures = {}
+    if "Description" in summary.values:
+        figures["top_products"] = ("draw_top_products", summary.top("Description"))
+    if "Country" in summary.values:
+        figures["top_countries"] = ("draw_top_countries", summary.top("Country"))
+    if summary.invoice_days is not None:
+        figures["daily_orders"] = ("draw_daily_orders", summary.daily_orders())
+    if rules is not None and not rules.empty:
+        figures["association_plot"] = ("draw_association_rules", viz.top_rules(rules, "confidence"))
+    if sim_df is not None and (hasattr(sim_df, "iloc") or hasattr(sim_df, "submatrix")):
+        figures["similarity_heatmap"] = ("draw_similarity_heatmap", viz.heatmap_subset(sim_df))
+        figures["similarity_hist"] = ("draw_similarity_histogram", viz.similarity_histogram(sim_df))
+    return figures
+
+def figure_path(name, draw, data, directory=FIGURE_DIR):
+    return os.path.join(directory, f"{name}_{joblib.hash((draw, data))[:16]}.png")
+
+def _render(draw, data, path):
+    fig = getattr(viz, draw)(data)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    plt.close(fig)
+    # fpdf unpacks an alpha channel in pure Python (about a second per figure); RGB embeds instantly.
+    # Written under a unique temporary name, so a half-written PNG is never mistaken for a cached one
+    # and two threads drawing the same figure never write into one file.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp.png")
+    with os.fdopen(fd, "wb") as f:
+        Image.open(buffer).convert("RGB").save(f, format="png")
+    os.replace(tmp_path, path)
+    return path
+
+def render_figures(figures, directory=FIGURE_DIR, max_workers=None):
+    # Returns {name: png path}; figures whose PNG already exists are not drawn again.
+    # max_workers sizes the shared pool when it is first started; 1 draws in this process.
+    os.makedirs(directory, exist_ok=True)
+    paths, pending = {}, []
+    for name, (draw, data) in figures.items():
+        paths[name] = figure_path(name, draw, data, directory)
+        if not os.path.exists(paths[name]):
+            pending.append((draw, data, paths[name]))
+
+    with span("render_figures", figures=len(figures), drawn=len(pending)):
+        if len(pending) == 1 or max_workers == 1:
+            for job in pending:
+                _render(*job)
+        elif pending:
+            pool = _figure_pool(max_workers)
+            try:
+                list(pool.map(_render, *zip(*pending)))
+            except BrokenProcessPool:
+                _drop_pool(pool)  # a worker died; the next call starts a fresh pool
+                raise
+    return paths
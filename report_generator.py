@@ -3,6 +3,7 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import os
 import datetime
+from instrumentation import span
 
 class PDFReport(FPDF):
     def header(self):
@@ -21,8 +22,13 @@ def save_plot(fig, filename):
     plt.close(fig)
     return path
 
-def generate_pdf_report(df, rules=None, sim_df=None, cleaning_options=None, filename="retail_report.pdf", general_plots=None, recommendation_plots = None, evaluation_stats=None):
-    os.makedirs("reports", exist_ok=True)
+def generate_pdf_report(df, rules=None, sim_df=None, cleaning_options=None, filename="retail_report.pdf", general_plots=None, recommendation_plots = None, evaluation_stats=None, summary=None, directory="reports"):
+    # summary: the SummaryCube of df, when the caller already has one
+    with span("pdf_report", rows=len(df), filename=filename):
+        return _render_pdf_report(df, rules, sim_df, cleaning_options, filename, general_plots, recommendation_plots, evaluation_stats, summary, directory)
+
+def _render_pdf_report(df, rules, sim_df, cleaning_options, filename, general_plots, recommendation_plots, evaluation_stats, summary, directory):
+    os.makedirs(directory, exist_ok=True)
     pdf = PDFReport()
     pdf.add_page()
     pdf.set_auto_page_break(auto=True, margin=15)
@@ -45,7 +51,8 @@ def generate_pdf_report(df, rules=None, sim_df=None, cleaning_options=None, file
     pdf.cell(0, 10, "2. Data Exploration:", ln=True)
     pdf.set_font("Arial", size=11)
     pdf.multi_cell(0, 8, f"Shape: {df.shape}")
-    pdf.multi_cell(0, 8, f"Missing values:\n{df.isnull().sum().to_string()}")
+    missing = summary.missing() if summary is not None else df.isnull().sum()
+    pdf.multi_cell(0, 8, f"Missing values:\n{missing.to_string()}")
     pdf.ln(5)
 
     # 3. Visualizations
@@ -79,8 +86,10 @@ def generate_pdf_report(df, rules=None, sim_df=None, cleaning_options=None, file
         pdf.set_font("Arial", "B", 12)
         pdf.cell(0, 10, "Top 5 Item Similarities:", ln=True)
         pdf.set_font("Arial", size=11)
-        for item in sim_df.columns[:5]:
-            similar = sim_df[item].nlargest(5).drop(item)
+        dense = isinstance(sim_df, pd.DataFrame)
+        for item in (sim_df.columns if dense else sim_df.labels)[:5]:
+            # Similarity models (e.g. ItemEmbeddings) answer the lookup themselves
+            similar = sim_df[item].nlargest(5).drop(item) if dense else sim_df.similar_items(item, 4)
             sims = ", ".join([f"{i}: {v:.2f}" for i, v in similar.items()])
             pdf.multi_cell(0, 10, f"  - {item} -> {sims}")
         pdf.ln(5)
@@ -110,6 +119,23 @@ def generate_pdf_report(df, rules=None, sim_df=None, cleaning_options=None, file
         if "similarity_hist_path" in evaluation_stats:
             pdf.multi_cell(0, 10, "- Similarity Score Distribution (excluding self-similarity):")
             pdf.image(evaluation_stats["similarity_hist_path"], w=170)
+        if "similarity_quantiles" in evaluation_stats:
+            quantiles = ", ".join(f"p{q * 100:g}: {value:.3f}" for q, value in evaluation_stats["similarity_quantiles"].items())
+            pdf.multi_cell(0, 10, f"- Similarity Quantiles (item pairs): {quantiles}")
+        if evaluation_stats.get("similarity_top_scores"):
+            top_scores = ", ".join(f"{value:.3f}" for value in evaluation_stats["similarity_top_scores"][:10])
+            pdf.multi_cell(0, 10, f"- Highest Pair Similarities: {top_scores}")
+        if "holdout" in evaluation_stats:
+            # evaluation.evaluate_models results: one row per model, metrics on held-out purchases
+            holdout = evaluation_stats["holdout"]
+            k = holdout.attrs.get("k", 10)
+            pdf.multi_cell(0, 10, f"- Held-out Evaluation (trained before {holdout.attrs.get('cutoff')}, top {k}, "
+                                  f"{holdout['customers'].max()} customers):")
+            for _, row in holdout.iterrows():
+                settings = ", ".join(f"{key}={value}" for key, value in row["settings"].items())
+                pdf.multi_cell(0, 8, f"  - {row['model']} ({settings}): precision@{k} {row[f'precision@{k}']:.3f}, "
+                                     f"recall@{k} {row[f'recall@{k}']:.3f}, hit rate {row['hit_rate']:.2f}, "
+                                     f"coverage {row['coverage']:.2f}")
 
 
     # 8. Security & Data Notice
@@ -125,6 +151,6 @@ def generate_pdf_report(df, rules=None, sim_df=None, cleaning_options=None, file
         "- This tool is intended for educational or non-sensitive use cases only."
     )
 
-    output_path = os.path.join("reports", filename)
+    output_path = os.path.join(directory, filename)
     pdf.output(output_path)
     return output_path
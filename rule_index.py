@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+def _flatten(itemsets, items):
+    # Array-backed itemsets: ids[ptr[r]:ptr[r + 1]] are the item ids of rule r
+    lengths = np.fromiter((len(s) for s in itemsets), dtype=np.int64, count=len(itemsets))
+    flat = [item for itemset in itemsets for item in itemset]
+    ptr = np.concatenate(([0], np.cumsum(lengths)))
+    return items.get_indexer(flat).astype(np.int32), ptr
+
+class RuleIndex:
+    # Rules with items interned to integer ids, numbered in descending confidence order,
+    # plus an inverted index from antecedent item to rule ids
+    def __init__(self, rules):
+        rules = rules.sort_values(by="confidence", ascending=False, kind="stable")
+        antecedents = list(rules["antecedents"])
+        consequents = list(rules["consequents"])
+        self.items = pd.Index(sorted(set().union(*antecedents, *consequents)))
+        self._positions = {item: position for position, item in enumerate(self.items)}
+
+        self.antecedent_ids, self.antecedent_ptr = _flatten(antecedents, self.items)
+        self.consequent_ids, self.consequent_ptr = _flatten(consequents, self.items)
+        self.confidence = rules["confidence"].to_numpy(dtype=np.float64)
+        self.lift = rules["lift"].to_numpy(dtype=np.float64)
+        self.support = rules["support"].to_numpy(dtype=np.float64)
+
+        # Stable sort by item keeps each posting list in rule id, i.e. confidence, order
+        rule_ids = np.repeat(np.arange(len(self.confidence)), np.diff(self.antecedent_ptr))
+        order = np.argsort(self.antecedent_ids, kind="stable")
+        self.postings = rule_ids[order].astype(np.int32)
+        self.postings_ptr = np.searchsorted(self.antecedent_ids[order], np.arange(len(self.items) + 1))
+
+    ARRAYS = ["antecedent_ids", "antecedent_ptr", "consequent_ids", "consequent_ptr",
+              "confidence", "lift", "support", "postings", "postings_ptr"]
+
+    def __len__(self):
+        return len(self.confidence)
+
+    def save(self, path):
+        np.savez(path, items=np.asarray(self.items, dtype=str), **{name: getattr(self, name) for name in self.ARRAYS})
+
+    @classmethod
+    def load(cls, path):
+        # Rebuilds the index from its arrays without touching the rules frame again
+        index = cls.__new__(cls)
+        with np.load(path) as data:
+            index.items = pd.Index(data["items"])
+            for name in cls.ARRAYS:
+                setattr(index, name, data[name])
+        index._positions = {item: position for position, item in enumerate(index.items)}
+        return index
+
+    def rule_ids(self, item_name, top_n=None):
+        position = self._positions.get(item_name)
+        if position is None:
+            return np.empty(0, dtype=np.int32)
+        start, stop = self.postings_ptr[position], self.postings_ptr[position + 1]
+        if top_n is not None:
+            stop = min(stop, start + top_n)
+        return self.postings[start:stop]
+
+    def basket_rule_ids(self, item_names, top_n=None):
+        # Rules whose whole antecedent is in the basket and whose consequents are all new to it;
+        # ids sort ascending in confidence order
+        positions = np.unique([self._positions[item] for item in item_names if item in self._positions]).astype(np.int64)
+        found = [self.postings[self.postings_ptr[p]:self.postings_ptr[p + 1]] for p in positions]
+        if not found:
+            return np.empty(0, dtype=np.int32)
+
+        # A rule is in one posting list per antecedent item, so it fires when it was found that often
+        ids, hits = np.unique(np.concatenate(found), return_counts=True)
+        ids = ids[hits == np.diff(self.antecedent_ptr)[ids]]
+
+        in_basket = np.zeros(len(self.items), dtype=bool)
+        in_basket[positions] = True
+        starts, lengths = self.consequent_ptr[ids], np.diff(self.consequent_ptr)[ids]
+        entries = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        owned = np.bincount(np.repeat(np.arange(len(ids)), lengths), weights=in_basket[self.consequent_ids[entries]],
+                            minlength=len(ids))
+        ids = ids[owned == 0]
+        return ids if top_n is None else ids[:top_n]
+
+    def _itemset(self, ids, ptr, rule_id):
+        return frozenset(self.items[ids[ptr[rule_id]:ptr[rule_id + 1]]])
+
+    def to_frame(self, rule_ids):
+        return pd.DataFrame({
+            "antecedents": [self._itemset(self.antecedent_ids, self.antecedent_ptr, r) for r in rule_ids],
+            "consequents": [self._itemset(self.consequent_ids, self.consequent_ptr, r) for r in rule_ids],
+            "confidence": self.confidence[rule_ids],
+            "lift": self.lift[rule_ids],
+            "support": self.support[rule_ids]
+        })
+
+    def recommend(self, item_name, top_n=5):
+        return self.to_frame(self.rule_ids(item_name, top_n))
+
+    def recommend_many(self, item_names, top_n=5):
+        # Independent top-n lookups for several items, tagged with the queried item
+        frames = [self.recommend(item, top_n).assign(item=item) for item in item_names]
+        if not frames:
+            return self.to_frame([]).assign(item=[])
+        return pd.concat(frames, ignore_index=True)
+
+    def recommend_for_basket(self, item_names, top_n=5):
+        return self.to_frame(self.basket_rule_ids(item_names, top_n))
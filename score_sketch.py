@@ -0,0 +1,86 @@
+# score_sketch.py
+# Streaming summary of pairwise similarity scores: a fixed fine histogram (for any number of display
+# bins and for quantiles), min/max and the top-k scores, in O(resolution + k) memory whatever the
+# number of pairs. Matrices are walked through their upper triangle one block of rows at a time, so
+# np.memmap matrices and item vectors (the matrix is never built) work as well as DataFrames.
+import numpy as np
+from sklearn.preprocessing import normalize
+from sklearn.utils.extmath import safe_sparse_dot
+
+class ScoreSketch:
+    def __init__(self, low=-1.0, high=1.0, resolution=4096, top_k=50):
+        # Cosine scores lie in [-1, 1]; quantiles are exact to within (high - low) / resolution
+        self.low, self.high, self.resolution, self.top_k = low, high, resolution, top_k
+        self.counts = np.zeros(resolution, dtype=np.int64)
+        self.minimum, self.maximum = np.inf, -np.inf
+        self.top_scores = np.empty(0)
+
+    @property
+    def n(self):
+        return int(self.counts.sum())
+
+    def update(self, scores):
+        scores = np.asarray(scores, dtype=np.float64).ravel()
+        if not scores.size:
+            return self
+        scale = self.resolution / (self.high - self.low)
+        bins = np.clip(((scores - self.low) * scale).astype(np.int64), 0, self.resolution - 1)
+        self.counts += np.bincount(bins, minlength=self.resolution)
+        self.minimum = min(self.minimum, scores.min())
+        self.maximum = max(self.maximum, scores.max())
+        k = min(self.top_k, scores.size)
+        if k:
+            best = scores[np.argpartition(scores, -k)[-k:]]
+            self.top_scores = np.sort(np.concatenate([self.top_scores, best]))[-self.top_k:]
+        return self
+
+    def update_from_matrix(self, sim, block_size=1024):
+        # Upper triangle only: every pair once, never the diagonal
+        values = sim.to_numpy() if hasattr(sim, "to_numpy") else sim
+        n_items = values.shape[0]
+        for start in range(0, n_items, block_size):
+            block = np.asarray(values[start:start + block_size, start:], dtype=np.float64)
+            above = np.arange(block.shape[1]) > np.arange(block.shape[0])[:, np.newaxis]
+            self.update(block[above])
+        return self
+
+    def update_from_vectors(self, item_vectors, block_size=1024, cosine=True):
+        # Same scores as update_from_matrix(cosine_similarity(item_vectors)) without the N x N matrix;
+        # cosine=False scores raw dot products (latent-factor embeddings)
+        vectors = normalize(item_vectors) if cosine else item_vectors
+        n_items = vectors.shape[0]
+        for start in range(0, n_items, block_size):
+            block = safe_sparse_dot(vectors[start:start + block_size], vectors[start:].T, dense_output=True)
+            block = np.asarray(block, dtype=np.float64)
+            above = np.arange(block.shape[1]) > np.arange(block.shape[0])[:, np.newaxis]
+            self.update(block[above])
+        return self
+
+    def quantile(self, q):
+        # Rank q * (n - 1), interpolated linearly inside its fine bin
+        if not self.n:
+            return np.nan
+        rank = q * (self.n - 1)
+        cumulative = np.cumsum(self.counts)
+        position = int(np.searchsorted(cumulative, rank, side="right"))
+        before = cumulative[position - 1] if position else 0
+        width = (self.high - self.low) / self.resolution
+        inside = (rank - before + 0.5) / self.counts[position]
+        value = self.low + (position + min(inside, 1.0)) * width
+        return float(np.clip(value, self.minimum, self.maximum))
+
+    def histogram(self, bins=30):
+        # Fine bins folded into `bins` equal bins spanning the observed [min, max]
+        if not self.n:
+            return np.zeros(bins, dtype=np.int64), np.linspace(0, 1, bins + 1)
+        low, high = self.minimum, self.maximum
+        if high == low:
+            low, high = low - 0.5, high + 0.5
+        edges = np.linspace(low, high, bins + 1)
+        width = (self.high - self.low) / self.resolution
+        centers = self.low + (np.arange(self.resolution) + 0.5) * width
+        target = np.clip(((centers - low) / (high - low) * bins).astype(np.int64), 0, bins - 1)
+        return np.bincount(target, weights=self.counts, minlength=bins).astype(np.int64), edges
+
+    def top(self):
+        return self.top_scores[::-1]
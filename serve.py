@@ -0,0 +1,134 @@
+# serve.py
+# Local HTTP service answering "bought together" and "similar items" lookups from the
+# tables written by pipeline.py. Models are loaded once; each request is a few array slices.
+# Usage: python serve.py --models pipeline_output [--host 127.0.0.1] [--port 8600]
+#
+#   GET  /health
+#   GET  /items?limit=100
+#   GET  /search?q=<text>&n=10       typeahead over the catalog; ids are similarity table positions
+#   GET  /bought-together?item=<name>&n=5
+#   GET  /similar?item=<name>&n=5
+#   POST /batch   {"kind": "bought-together" | "similar", "items": [...], "n": 5}
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from pipeline import load_pipeline_outputs
+from catalog_search import CatalogIndex
+
+MAX_TOP_N = 100
+
+class RecommendationModels:
+    def __init__(self, output_dir):
+        outputs = load_pipeline_outputs(output_dir)
+        self.rules = outputs["rules"]
+        self.similarity = outputs["similarity"]
+        # Plain lists make label lookups cheaper than indexing a pandas Index per request
+        self.rule_items = self.rules.items.tolist()
+        self.similarity_items = self.similarity.labels.tolist()
+        self.catalog = CatalogIndex(self.similarity.labels)
+
+    def _itemset(self, ids, ptr, rule_id):
+        return [self.rule_items[i] for i in ids[ptr[rule_id]:ptr[rule_id + 1]]]
+
+    def bought_together(self, item_name, top_n=5):
+        rules = self.rules
+        return [{
+            "antecedents": self._itemset(rules.antecedent_ids, rules.antecedent_ptr, rule_id),
+            "consequents": self._itemset(rules.consequent_ids, rules.consequent_ptr, rule_id),
+            "confidence": float(rules.confidence[rule_id]),
+            "lift": float(rules.lift[rule_id]),
+            "support": float(rules.support[rule_id])
+        } for rule_id in rules.rule_ids(item_name, top_n)]
+
+    def similar(self, item_name, top_n=5):
+        found = self.similarity.lookup(item_name, top_n)
+        if found is None:
+            return []
+        neighbours, scores = found
+        return [{"item": self.similarity_items[position], "similarity": float(score)}
+                for position, score in zip(neighbours, scores)]
+
+    def search(self, query, top_n=10):
+        return [{"id": int(item_id), "item": self.similarity_items[item_id]} for item_id in self.catalog.search(query, top_n)]
+
+    def lookup(self, kind, item_name, top_n=5):
+        if kind == "bought-together":
+            return self.bought_together(item_name, top_n)
+        if kind == "similar":
+            return self.similar(item_name, top_n)
+        raise KeyError(kind)
+
+class RecommendationHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so clients do not reconnect per query
+    disable_nagle_algorithm = True  # otherwise small responses wait on delayed ACKs (~40 ms)
+    models = None
+
+    def log_message(self, format, *args):
+        pass  # per-request stderr logging would dominate the latency
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        kind = url.path.strip("/")
+        try:
+            top_n = max(1, min(int(query.get("n", ["5"])[0]), MAX_TOP_N))
+            if kind == "health":
+                self._send(200, {"status": "ok"})
+            elif kind == "items":
+                limit = int(query.get("limit", ["100"])[0])
+                self._send(200, {"items": self.models.similarity_items[:limit]})
+            elif kind == "search" and "q" in query:
+                self._send(200, {"query": query["q"][0], "results": self.models.search(query["q"][0], top_n)})
+            elif kind in ("bought-together", "similar") and "item" in query:
+                item_name = query["item"][0]
+                self._send(200, {"item": item_name, "results": self.models.lookup(kind, item_name, top_n)})
+            else:
+                self._send(404, {"error": f"Unknown endpoint or missing item: {url.path}"})
+        except ValueError as e:
+            self._send(400, {"error": str(e)})
+
+    def do_POST(self):
+        if urlparse(self.path).path.strip("/") != "batch":
+            self._send(404, {"error": f"Unknown endpoint: {self.path}"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if not isinstance(request, dict) or not isinstance(request.get("items"), list):
+                raise ValueError('expected an object with an "items" list')
+            top_n = max(1, min(int(request.get("n", 5)), MAX_TOP_N))
+            results = {item: self.models.lookup(request["kind"], item, top_n) for item in request["items"]}
+            self._send(200, {"results": results})
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {"error": f"Bad batch request: {e}"})
+
+def make_server(models_dir, host="127.0.0.1", port=8600):
+    handler = type("Handler", (RecommendationHandler,), {"models": RecommendationModels(models_dir)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve precomputed recommendations over HTTP.")
+    parser.add_argument("--models", default="pipeline_output", help="Output directory of pipeline.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    args = parser.parse_args(argv)
+
+    server = make_server(args.models, args.host, args.port)
+    print(f"Serving recommendations from {args.models} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
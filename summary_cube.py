@@ -0,0 +1,139 @@
+# summary_cube.py
+# One aggregation pass over the transactions that every chart, the exploration panel and the PDF
+# read from: value counts per column (product, country, ... which also give null counts and exact
+# describe() statistics) and line counts per (day, invoice) for distinct invoices per day.
+# Cubes add and subtract, so cleaning updates them from the dropped rows instead of a rescan.
+import numpy as np
+import pandas as pd
+
+DESCRIBE_ROWS = ["count", "unique", "top", "freq", "mean", "std", "min", "25%", "50%", "75%", "max"]
+
+def _value_counts(values):
+    counts = values.value_counts(sort=False)
+    counts = counts[counts > 0]
+    if isinstance(counts.index.dtype, pd.CategoricalDtype):
+        # Plain labels, so cubes built from chunks with different categories still line up
+        counts.index = pd.Index(np.asarray(counts.index), name=counts.index.name)
+    return counts.astype(np.int64)
+
+def _combine(a, b, sign=1):
+    combined = a.add(sign * b, fill_value=0)
+    return combined[combined > 0].astype(np.int64)
+
+def invoice_days(df):
+    # Invoice dates are parsed here if needed; the caller's frame is never written to
+    dates = df["InvoiceDate"]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors="coerce")
+    pairs = pd.DataFrame({"Date": dates.dt.normalize(), "InvoiceNo": np.asarray(df["InvoiceNo"], dtype=object)})
+    return pairs.groupby(["Date", "InvoiceNo"], sort=False).size().astype(np.int64)
+
+def orders_per_day(days):
+    # Distinct invoices per day from the (Date, InvoiceNo) line counts
+    return days.groupby(level="Date").size().sort_index().rename("InvoiceNo")
+
+def _weighted_quantile(values, cumulative, n, q):
+    # Linear interpolation between order statistics, as Series.quantile does
+    position = q * (n - 1)
+    low, high = int(np.floor(position)), int(np.ceil(position))
+    at_low = values[np.searchsorted(cumulative, low, side="right")]
+    at_high = values[np.searchsorted(cumulative, high, side="right")]
+    return at_low + (at_high - at_low) * (position - low)
+
+class SummaryCube:
+    def __init__(self, rows, dtypes, nulls, values, invoice_days=None):
+        self.rows = rows
+        self.dtypes = dtypes              # column -> dtype
+        self.nulls = nulls                # column -> missing values
+        self.values = values              # column -> Series of counts per distinct value
+        self.invoice_days = invoice_days  # (Date, InvoiceNo) -> invoice lines
+
+    @classmethod
+    def from_frame(cls, df):
+        days = invoice_days(df) if {"InvoiceDate", "InvoiceNo"} <= set(df.columns) else None
+        return cls(len(df), df.dtypes.copy(), df.isna().sum(),
+                   {col: _value_counts(df[col]) for col in df.columns}, days)
+
+    def _merge(self, other, sign):
+        days = None
+        if self.invoice_days is not None and other.invoice_days is not None:
+            days = _combine(self.invoice_days, other.invoice_days, sign)
+        return SummaryCube(self.rows + sign * other.rows, self.dtypes, self.nulls + sign * other.nulls,
+                           {col: _combine(counts, other.values[col], sign) for col, counts in self.values.items()}, days)
+
+    def __add__(self, other):
+        # Cube of two chunks
+        return self._merge(other, 1)
+
+    def __sub__(self, other):
+        # Cube without the rows that other was built from
+        return self._merge(other, -1)
+
+    def transform(self, column, transform):
+        # Applies a column transform (as clean_data would) to the distinct values only
+        if column not in self.values:
+            return self
+        counts = self.values[column]
+        mapped = transform(pd.Series(counts.index, dtype=counts.index.dtype))
+        # What a missing value becomes, e.g. astype(str) may turn it into a "nan" label
+        null_label = transform(pd.Series([np.nan], dtype=self.dtypes[column])).iloc[0]
+        missing = pd.isna(null_label)
+        nulls, values, dtypes = self.nulls.copy(), dict(self.values), self.dtypes.copy()
+        regrouped = pd.Series(counts.to_numpy(), index=mapped.to_numpy()).rename_axis(column)
+        nulls[column] = (nulls[column] if missing else 0) + int(regrouped[mapped.isna().to_numpy()].sum())
+        values[column] = regrouped[mapped.notna().to_numpy()].groupby(level=0, sort=False).sum()
+        if not missing and self.nulls[column]:
+            values[column] = _combine(values[column], pd.Series({null_label: self.nulls[column]}))
+        dtypes[column] = mapped.dtype
+        return SummaryCube(self.rows, dtypes, nulls, values, self.invoice_days)
+
+    def after_cleaning(self, df, plan, keep):
+        # Cube of apply_cleaning_plan(df, plan) given this cube of df and the plan's row mask
+        cube = self if keep.all() else self - SummaryCube.from_frame(df.loc[~keep])
+        for _, column, transform in plan["transforms"]:
+            cube = cube.transform(column, transform)
+        return cube
+
+    def top(self, column, n=10):
+        counts = self.values[column].sort_values(ascending=False, kind="stable").head(n)
+        return counts.rename("count").rename_axis(column)
+
+    def daily_orders(self):
+        return orders_per_day(self.invoice_days)
+
+    def missing(self):
+        return self.nulls
+
+    def describe(self):
+        # describe(include='all') from the value counts, with the same rows and order
+        table = {}
+        for column, counts in self.values.items():
+            dtype = self.dtypes[column]
+            stats = pd.Series(np.nan, index=DESCRIBE_ROWS, dtype=object)
+            n = int(counts.sum())
+            stats["count"] = n
+            is_datetime = pd.api.types.is_datetime64_any_dtype(dtype)
+            if (pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)) or is_datetime:
+                if n:
+                    ordered = counts.sort_index()
+                    values = ordered.index.to_numpy()
+                    numbers = values.view("i8") if is_datetime else values.astype(np.float64)
+                    weights = ordered.to_numpy()
+                    cumulative = np.cumsum(weights)
+                    mean = np.average(numbers, weights=weights)
+                    summary = {"mean": mean, "min": numbers[0], "max": numbers[-1]}
+                    for q, label in ((0.25, "25%"), (0.5, "50%"), (0.75, "75%")):
+                        summary[label] = _weighted_quantile(numbers, cumulative, n, q)
+                    for label, value in summary.items():
+                        stats[label] = pd.Timestamp(np.array([round(value)], dtype="i8").view(values.dtype)[0]) if is_datetime else value
+                    if not is_datetime:
+                        stats["std"] = np.sqrt(np.sum(weights * (numbers - mean) ** 2) / (n - 1)) if n > 1 else np.nan
+            elif n:
+                top = counts.sort_values(ascending=False, kind="stable")
+                stats["unique"], stats["top"], stats["freq"] = len(counts), top.index[0], int(top.iloc[0])
+            table[column] = stats
+        described = pd.DataFrame(table).dropna(how="all")
+        if any(pd.api.types.is_datetime64_any_dtype(dtype) for dtype in self.dtypes):
+            # pandas moves std to the end once a datetime column is described
+            described = described.reindex([row for row in described.index if row != "std"] + ["std"]).dropna(how="all")
+        return described
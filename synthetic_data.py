@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+COUNTRIES = ["United Kingdom", "Germany", "France", "EIRE", "Spain", "Netherlands",
+             "Belgium", "Switzerland", "Portugal", "Australia", "Norway", "Italy"]
+
+def _power_law(n, exponent):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+def generate_transactions(n_rows=100_000, n_items=None, n_customers=None, mean_basket=20,
+                          cancel_rate=0.02, missing_customer_rate=0.1, start="2010-12-01",
+                          days=365, seed=0, text_dates=False):
+    # Online-Retail-shaped invoice lines: power-law item and customer popularity, geometric
+    # basket sizes, a UK-heavy country mix, business-hour timestamps and cancelled invoices
+    rng = np.random.default_rng(seed)
+    n_items = n_items or 4000  # catalog size of the UCI Online Retail data
+    n_customers = n_customers or int(min(100_000, max(20, n_rows / 100)))
+
+    sizes = rng.geometric(1.0 / mean_basket, size=n_rows // max(mean_basket // 2, 1) + 1)
+    sizes = sizes[:np.searchsorted(np.cumsum(sizes), n_rows) + 1]
+    sizes[-1] -= sizes.sum() - n_rows
+    sizes = sizes[sizes > 0]
+    n_invoices = len(sizes)
+    invoice_of_row = np.repeat(np.arange(n_invoices), sizes)
+
+    # Invoice-level attributes, repeated onto their lines
+    cancelled = rng.random(n_invoices) < cancel_rate
+    invoice_no = np.char.add(np.where(cancelled, "C", ""), (536365 + np.arange(n_invoices)).astype(str))
+    customers = rng.choice(n_customers, size=n_invoices, p=_power_law(n_customers, 0.8)).astype(np.float64) + 12346
+    customers[rng.random(n_invoices) < missing_customer_rate] = np.nan
+    country_p = np.full(len(COUNTRIES), 0.1 / (len(COUNTRIES) - 1))
+    country_p[0] = 0.9
+    countries = rng.choice(len(COUNTRIES), size=n_invoices, p=country_p)
+    day = np.sort(rng.integers(0, days, size=n_invoices))
+    minute = rng.integers(8 * 60, 18 * 60, size=n_invoices)
+    dates = pd.Timestamp(start) + pd.to_timedelta(day * 1440 + minute, unit="m")
+
+    items = rng.choice(n_items, size=n_rows, p=_power_law(n_items, 0.5))
+    item_ids = np.arange(n_items).astype(str)
+    prices = np.round(rng.lognormal(mean=0.8, sigma=0.9, size=n_items), 2) + 0.01
+    quantity = rng.geometric(0.25, size=n_rows)
+    quantity = np.where(cancelled[invoice_of_row], -quantity, quantity)
+
+    df = pd.DataFrame({
+        "InvoiceNo": invoice_no[invoice_of_row],
+        "StockCode": np.char.add("SKU", item_ids)[items],
+        "Description": np.char.add("PRODUCT ", item_ids)[items],
+        "Quantity": quantity,
+        "InvoiceDate": dates[invoice_of_row],
+        "UnitPrice": prices[items],
+        "CustomerID": customers[invoice_of_row],
+        "Country": np.asarray(COUNTRIES)[countries[invoice_of_row]]
+    })
+    if text_dates:
+        # Text dates in the UCI CSV order (month/day/year hour:minute)
+        df["InvoiceDate"] = df["InvoiceDate"].dt.strftime("%m/%d/%Y %H:%M")
+    return df
@@ -1,47 +1,110 @@
-
 import matplotlib.pyplot as plt
 import seaborn as sns
+import numpy as np
 import pandas as pd
+from instrumentation import span
+from summary_cube import invoice_days, orders_per_day
+from score_sketch import ScoreSketch
 
-def plot_top_products(df):
-    top = df['Description'].value_counts().head(10)
+# Each chart is split into the small table it draws and the drawing itself, so report_figures can
+# hash the table and draw it in a worker process. The app reads the tables from a SummaryCube;
+# the helpers below compute them straight from a frame for one-off plots.
+
+def top_counts(df, column, n=10):
+    return df[column].value_counts().head(n)
+
+def daily_order_counts(df):
+    return orders_per_day(invoice_days(df))
+
+def top_rules(rules_df, metric='confidence', n=10):
+    top = rules_df.sort_values(by=metric, ascending=False).head(n)
+    labels = top['antecedents'].astype(str) + "->" + top['consequents'].astype(str)
+    return pd.DataFrame({"rule": labels.to_numpy(), metric: top[metric].to_numpy()})
+
+def heatmap_subset(sim_df, top_n=20):
+    if hasattr(sim_df, 'submatrix'):
+        # Latent-factor models compute just this block
+        return sim_df.submatrix(np.arange(min(top_n, len(sim_df))))
+    return sim_df.iloc[:top_n, :top_n]
+
+def similarity_histogram(sim, bins=30, top_n=50, block_size=1024):
+    # (counts, edges, top scores, quartiles) of the distinct item pairs, streamed through a ScoreSketch
+    sketch = ScoreSketch(top_k=top_n)
+    if hasattr(sim, 'vectors'):
+        sketch.update_from_vectors(sim.vectors, block_size, cosine=False)
+    else:
+        sketch.update_from_matrix(sim, block_size)
+    counts, edges = sketch.histogram(bins)
+    quantiles = {q: sketch.quantile(q) for q in (0.25, 0.5, 0.75, 0.9, 0.99)}
+    return counts, edges, sketch.top_scores, quantiles
+
+def draw_top_products(top):
     fig, ax = plt.subplots()
     sns.barplot(x=top.values, y=top.index, ax=ax)
     ax.set_title("Top 10 Products")
     return fig
 
-def plot_top_countries(df):
-    top = df['Country'].value_counts().head(10)
+def draw_top_countries(top):
     fig, ax = plt.subplots()
     sns.barplot(x=top.values, y=top.index, ax=ax)
     ax.set_title("Top 10 Countries by Transactions")
     return fig
 
-def plot_daily_orders(df):
-    df['InvoiceDate'] = pd.to_datetime(df['InvoiceDate'], errors='coerce')
-    df['Date'] = df['InvoiceDate'].dt.date
-    daily_orders = df.groupby('Date')['InvoiceNo'].nunique()
+def draw_daily_orders(daily_orders):
     fig, ax = plt.subplots(figsize=(12, 4))
     daily_orders.plot(ax=ax)
     ax.set_title("Number of Orders Per Day")
     return fig
 
-def plot_association_rules(rules_df, metric='confidence'):
-    top_rules = rules_df.sort_values(by=metric, ascending=False).head(10)
+def draw_association_rules(top):
+    metric = top.columns[1]
     fig, ax = plt.subplots(figsize=(10, 5))
-    sns.barplot(data=top_rules, x=metric, y=top_rules['antecedents'].astype(str) + "->" + top_rules['consequents'].astype(str), ax=ax)
+    sns.barplot(data=top, x=metric, y="rule", ax=ax)
     ax.set_title(f"Top 10 Association Rules by {metric.capitalize()}")
     return fig
 
-def plot_similarity_heatmap(sim_df, top_n=20):
-    if sim_df is None or not hasattr(sim_df, 'iloc'):
-        return None
-
-    subset = sim_df.iloc[:top_n, :top_n]
+def draw_similarity_heatmap(subset):
     fig, ax = plt.subplots(figsize=(10, 8))
     sns.heatmap(subset, cmap="YlGnBu", ax=ax)
-    plt.title("Item Similarity Heatmap")
-    plt.xticks(rotation=90)
-    plt.yticks(rotation=0)
-    plt.tight_layout()
+    ax.set_title("Item Similarity Heatmap")
+    ax.tick_params(axis='x', labelrotation=90)
+    ax.tick_params(axis='y', labelrotation=0)
+    fig.tight_layout()
+    return fig
+
+def draw_similarity_histogram(histogram):
+    counts, edges = histogram[0], histogram[1]
+    fig, ax = plt.subplots()
+    ax.hist(edges[:-1], bins=edges, weights=counts, color='skyblue', edgecolor='black')
+    ax.set_title("Distribution of Similarity Scores")
+    ax.set_xlabel("Similarity Score")
+    ax.set_ylabel("Frequency")
+    fig.tight_layout()
     return fig
+
+def plot_top_products(df):
+    with span("plot:top_products", rows=len(df)):
+        return draw_top_products(top_counts(df, 'Description'))
+
+def plot_top_countries(df):
+    with span("plot:top_countries", rows=len(df)):
+        return draw_top_countries(top_counts(df, 'Country'))
+
+def plot_daily_orders(df):
+    with span("plot:daily_orders", rows=len(df)):
+        return draw_daily_orders(daily_order_counts(df))
+
+def plot_association_rules(rules_df, metric='confidence'):
+    with span("plot:association_rules", rows=len(rules_df), metric=metric):
+        return draw_association_rules(top_rules(rules_df, metric))
+
+def plot_similarity_heatmap(sim_df, top_n=20):
+    if sim_df is None or not (hasattr(sim_df, 'iloc') or hasattr(sim_df, 'submatrix')):
+        return None
+
+    with span("plot:similarity_heatmap", items=len(sim_df), top_n=top_n):
+        return draw_similarity_heatmap(heatmap_subset(sim_df, top_n))
+
+def plot_similarity_histogram(sim_df):
+    with span("plot:similarity_histogram", items=len(sim_df)):
+        return draw_similarity_histogram(similarity_histogram(sim_df))